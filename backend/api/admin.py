@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from api.models import (
     AmountIngredient,
+    ImageStatus,
     Ingredient,
     MeasurementUnit,
     Recipe,
@@ -39,15 +40,27 @@ class AmountAdminStackedInline(admin.StackedInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    readonly_fields = ("pub_date", "count_favorite")
+    readonly_fields = (
+        "pub_date",
+        "favorites_count",
+        "shopping_cart_count",
+        "image_status",
+    )
     inlines = (AmountAdminStackedInline,)
     fields = (
         "name",
         "author",
-        "count_favorite",
+        "favorites_count",
+        "shopping_cart_count",
         "tags",
         "image",
+        "image_status",
         "text",
         "cooking_time",
     )
     search_fields = ["name", "author__username", "tags__name"]
+
+    def save_model(self, request, obj, form, change):
+        if "image" in form.changed_data:
+            obj.image_status = ImageStatus.PENDING
+        super().save_model(request, obj, form, change)
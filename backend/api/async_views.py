@@ -0,0 +1,88 @@
+import asyncio
+from typing import Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import URLPattern
+from rest_framework.exceptions import NotAcceptable
+
+from api.response_cache import lookup
+
+# reads most of the traffic goes to, served by async views under ASGI
+HOT_READS = (
+    "recipes-list",
+    "recipes-detail",
+    "tags-list",
+    "tags-detail",
+    "ingredients-list",
+    "ingredients-detail",
+    "subscriptions-list",
+)
+
+
+def get_cached(view, request, *args, **kwargs) -> Optional[HttpResponse]:
+    """Response of the anonymous cache, without dispatching the view.
+
+    Sets up the viewset the way APIView.dispatch does up to the content
+    negotiation the cache key depends on. Makes one query, of the
+    generation tokens."""
+    viewset = view.cls(**view.initkwargs)
+    viewset.action_map = view.actions
+    viewset.args, viewset.kwargs = args, kwargs
+    viewset.request = viewset.initialize_request(request, *args, **kwargs)
+    viewset.format_kwarg = viewset.get_format_suffix(**kwargs)
+    # without the Authorization header no authenticator reads the database
+    if viewset.request.user.is_authenticated:
+        return None
+    try:
+        negotiated = viewset.perform_content_negotiation(viewset.request)
+    except NotAcceptable:
+        return None
+    viewset.request.accepted_renderer, viewset.request.accepted_media_type = (
+        negotiated
+    )
+    return lookup(viewset, viewset.request)[1]
+
+
+def as_async(view: Callable) -> Callable:
+    """Async view running the sync DRF view in the thread pool.
+
+    Django 3.2 has no async ORM, so the view itself, with its queries,
+    runs in sync_to_async, in the thread of the request given by
+    backend.asgi.RequestThreadASGIHandler. Cached responses of anonymous
+    users are answered without the view, with one query of the
+    generation tokens."""
+    sync_view = sync_to_async(view)
+    cached = getattr(view.cls, "get_cache_generations", None) is not None
+    # the generation tokens are read in the thread of the request
+    get_cached_async = sync_to_async(get_cached)
+
+    async def async_view(request, *args, **kwargs):
+        anonymous = "HTTP_AUTHORIZATION" not in request.META
+        if cached and anonymous and request.method == "GET":
+            response = await get_cached_async(view, request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    async_view.csrf_exempt = getattr(view, "csrf_exempt", False)
+    return async_view
+
+
+def async_read_urls(urlpatterns: list) -> list:
+    """The url patterns with the hot reads served by async views."""
+    patterns = []
+    for pattern in urlpatterns:
+        if (
+            isinstance(pattern, URLPattern)
+            and pattern.name in HOT_READS
+            and not asyncio.iscoroutinefunction(pattern.callback)
+        ):
+            pattern = URLPattern(
+                pattern.pattern,
+                as_async(pattern.callback),
+                pattern.default_args,
+                pattern.name,
+            )
+        patterns.append(pattern)
+    return patterns
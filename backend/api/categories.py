@@ -0,0 +1,111 @@
+from typing import List, Set
+
+from django.db import connection, transaction
+
+from api.counters import RECIPE_CATEGORY_COUNTERS, increment
+from api.models import Recipe
+
+
+def get_through_sql(related_name: str) -> dict:
+    through = getattr(Recipe, related_name).through
+    quote = connection.ops.quote_name
+    return {
+        "through": quote(through._meta.db_table),
+        "recipe": quote(through._meta.get_field("recipe").column),
+        "user": quote(through._meta.get_field("customuser").column),
+        "recipes": quote(Recipe._meta.db_table),
+        "pk": quote(Recipe._meta.pk.column),
+    }
+
+
+def add_to_category(related_name: str, recipe_pk: int, user_pk: int) -> bool:
+    """Add the recipe to the category of the user and count it.
+
+    One INSERT ... ON CONFLICT DO NOTHING RETURNING, so of concurrent
+    adds of the same recipe exactly one inserts the row and increments
+    the counter. False when the recipe was there or doesn't exist."""
+    sql = (
+        "INSERT INTO {through} ({recipe}, {user}) SELECT %s, %s"
+        " WHERE EXISTS (SELECT 1 FROM {recipes} WHERE {pk} = %s)"
+        " ON CONFLICT ({recipe}, {user}) DO NOTHING RETURNING {recipe}"
+    ).format(**get_through_sql(related_name))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, (recipe_pk, user_pk, recipe_pk))
+        added = cursor.fetchone() is not None
+        if added:
+            increment(
+                Recipe.objects.filter(pk=recipe_pk),
+                RECIPE_CATEGORY_COUNTERS[related_name],
+            )
+    return added
+
+
+def remove_from_category(
+    related_name: str, recipe_pk: int, user_pk: int
+) -> bool:
+    """Remove the recipe from the category of the user and count it.
+
+    One DELETE ... RETURNING, False when the recipe was not there."""
+    sql = (
+        "DELETE FROM {through} WHERE {recipe} = %s AND {user} = %s"
+        " RETURNING {recipe}"
+    ).format(**get_through_sql(related_name))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, (recipe_pk, user_pk))
+        removed = cursor.fetchone() is not None
+        if removed:
+            increment(
+                Recipe.objects.filter(pk=recipe_pk),
+                RECIPE_CATEGORY_COUNTERS[related_name],
+                -1,
+            )
+    return removed
+
+
+def add_many_to_category(
+    related_name: str, recipe_pks: List[int], user_pk: int
+) -> Set[int]:
+    """Add the recipes to the category of the user and count them.
+
+    One INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING, only
+    the rows it inserted are counted, so concurrent batches with the
+    same recipe count it once. Returns the ids of the added recipes,
+    recipes already there or not existing are skipped."""
+    placeholders = ", ".join(["%s"] * len(recipe_pks))
+    sql = (
+        "INSERT INTO {through} ({recipe}, {user}) SELECT {pk}, %s"
+        f" FROM {{recipes}} WHERE {{pk}} IN ({placeholders})"
+        " ON CONFLICT ({recipe}, {user}) DO NOTHING RETURNING {recipe}"
+    ).format(**get_through_sql(related_name))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, (user_pk, *recipe_pks))
+        added = {pk for pk, in cursor.fetchall()}
+        if added:
+            increment(
+                Recipe.objects.filter(pk__in=added),
+                RECIPE_CATEGORY_COUNTERS[related_name],
+            )
+    return added
+
+
+def remove_many_from_category(
+    related_name: str, recipe_pks: List[int], user_pk: int
+) -> Set[int]:
+    """Remove the recipes from the category of the user and count them.
+
+    One DELETE ... RETURNING, returns the ids of the removed recipes."""
+    placeholders = ", ".join(["%s"] * len(recipe_pks))
+    sql = (
+        "DELETE FROM {through} WHERE {user} = %s"
+        f" AND {{recipe}} IN ({placeholders}) RETURNING {{recipe}}"
+    ).format(**get_through_sql(related_name))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, (user_pk, *recipe_pks))
+        removed = {pk for pk, in cursor.fetchall()}
+        if removed:
+            increment(
+                Recipe.objects.filter(pk__in=removed),
+                RECIPE_CATEGORY_COUNTERS[related_name],
+                -1,
+            )
+    return removed
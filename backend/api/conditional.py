@@ -0,0 +1,122 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.db.models import Count, Max, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from api.models import Recipe, Subscription
+from api.versions import get_versions
+from users.models import CustomUser
+
+
+class Validators:
+    """State a response depends on, turned into ETag and Last-Modified.
+
+    The state is any repr-able value, the time is left out when
+    a part of the state has no timestamp (the per-user flags)."""
+
+    def __init__(self, state, last_modified=None):
+        self.state = state
+        self.last_modified = last_modified
+
+    @property
+    def etag(self) -> str:
+        digest = hashlib.md5(repr(self.state).encode()).hexdigest()
+        return quote_etag(digest)
+
+    @property
+    def timestamp(self) -> Optional[int]:
+        if self.last_modified is None:
+            return None
+        return int(self.last_modified.timestamp())
+
+
+def versions_state(*keys: str) -> tuple:
+    """Tokens and the latest bump time of the CacheVersion keys."""
+    versions = get_versions(*keys)
+    tokens = tuple(
+        versions[key].version if key in versions else "" for key in keys
+    )
+    times = [version.updated_at for version in versions.values()]
+    return tokens, max(times, default=None)
+
+
+def latest(*times: Optional[datetime]) -> Optional[datetime]:
+    return max((time for time in times if time is not None), default=None)
+
+
+def rows_state(model, field_name: str) -> Tuple[Coalesce, Coalesce]:
+    """Count and max id of the rows of the outer user.
+
+    Any insert or delete changes one of them, since ids only grow."""
+    rows = (
+        model.objects.filter(**{field_name: OuterRef("pk")})
+        .order_by()
+        .values(field_name)
+    )
+    return (
+        Coalesce(Subquery(rows.annotate(count=Count("*")).values("count")), 0),
+        Coalesce(Subquery(rows.annotate(last=Max("pk")).values("last")), 0),
+    )
+
+
+def recipes_state(user, recipes: QuerySet) -> Tuple[Optional[datetime], tuple]:
+    """Latest updated_at of the recipes and the state of the user flags.
+
+    The flags is_favorited, is_in_shopping_cart and is_subscribed depend
+    on the favorites, shopping cart and subscriptions of the user. Read
+    with the timestamp in one query."""
+    latest_recipes = recipes.order_by("-updated_at").values("updated_at")
+    if user.is_anonymous:
+        return latest_recipes.values_list("updated_at", flat=True).first(), ()
+    favorites = Recipe.users_chose_as_favorite.through
+    cart = Recipe.users_put_in_cart.through
+    expressions = (
+        *rows_state(favorites, "customuser"),
+        *rows_state(cart, "customuser"),
+        *rows_state(Subscription, "follower"),
+    )
+    annotations = {
+        f"state_{number}": expression
+        for number, expression in enumerate(expressions)
+    }
+    updated_at, *state = (
+        CustomUser.objects.filter(pk=user.pk)
+        .annotate(updated_at=Subquery(latest_recipes[:1]), **annotations)
+        .values_list("updated_at", *annotations)
+        .get()
+    )
+    return updated_at, tuple(state)
+
+
+def conditional_get(method):
+    """Answer If-None-Match and If-Modified-Since of a view method.
+
+    The view computes its validators in get_validators(), the method
+    runs only when the client copy is stale."""
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return method(self, request, *args, **kwargs)
+        response = get_conditional_response(
+            request,
+            etag=validators.etag,
+            last_modified=validators.timestamp,
+        )
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = validators.etag
+            if validators.timestamp is not None:
+                response["Last-Modified"] = http_date(validators.timestamp)
+        # the flags of the request user are part of the validators
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    return wrapper
@@ -8,3 +8,43 @@ IS_IN_SHOPING_CART_VALUES = {
     "true": True,
     "false": False,
 }
+
+
+SHOPPING_LIST_FILE_TYPES = {
+    "pdf": ("application/pdf", "shopong-list.pdf"),
+    "txt": ("text/plain; charset=utf-8", "shopping-list.txt"),
+}
+
+
+# recipes with any or with all of the tags of the filter
+RECIPE_TAGS_MATCH_MODES = (
+    ("any", "any"),
+    ("all", "all"),
+)
+
+
+# recipes added to or removed from favorites or the cart in one request
+RECIPES_BATCH_MAX_SIZE = 100
+
+
+INGREDIENT_SEARCH_MODES = (
+    ("prefix", "prefix"),
+    ("fuzzy", "fuzzy"),
+)
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_SEARCH_MAX_LIMIT = 100
+
+
+# longest sides of the recipe image variants, the card is shown in lists
+IMAGE_CARD = "card"
+IMAGE_DETAIL = "detail"
+IMAGE_VARIANTS = {
+    IMAGE_CARD: (480, 480),
+    IMAGE_DETAIL: (1200, 1200),
+}
+IMAGE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+# understood by every client, webp urls are listed in image_variants
+IMAGE_REPRESENTATION_FORMAT = "jpeg"
@@ -0,0 +1,64 @@
+from typing import Dict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+RECIPE_CATEGORY_COUNTERS = {
+    "users_chose_as_favorite": "favorites_count",
+    "users_put_in_cart": "shopping_cart_count",
+}
+
+
+def increment(queryset, counter: str, delta: int = 1) -> int:
+    value = F(counter) + delta
+    if delta < 0:
+        # rows changed behind the API must not break the positive check,
+        # the drift is fixed by the reconcile_counters command
+        value = Greatest(value, 0)
+    return queryset.update(**{counter: value})
+
+
+def count_related(model, field_name: str) -> Coalesce:
+    rows = (
+        model.objects.filter(**{field_name: OuterRef("pk")})
+        .order_by()
+        .values(field_name)
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+def reconcile_counters(recipe_model, user_model, subscription_model) -> Dict:
+    """Recount stored counters, returns the number of fixed rows of each.
+
+    Models are passed in, so migrations can use their historical ones."""
+    recipe_fields = recipe_model._meta
+    favorites = recipe_fields.get_field("users_chose_as_favorite")
+    cart = recipe_fields.get_field("users_put_in_cart")
+    counters = (
+        (
+            recipe_model,
+            "favorites_count",
+            count_related(favorites.remote_field.through, "recipe"),
+        ),
+        (
+            recipe_model,
+            "shopping_cart_count",
+            count_related(cart.remote_field.through, "recipe"),
+        ),
+        (user_model, "recipes_count", count_related(recipe_model, "author")),
+        (
+            user_model,
+            "followers_count",
+            count_related(subscription_model, "leader"),
+        ),
+    )
+    fixed = {}
+    for model, counter, actual in counters:
+        fixed[counter] = (
+            model.objects.exclude(**{counter: actual})
+            .order_by()
+            .update(**{counter: actual})
+        )
+    return fixed
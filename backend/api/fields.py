@@ -1,7 +1,119 @@
+import base64
+import binascii
+import re
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64FieldMixin, Base64FileField
+from PIL import Image
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from api.constants import IMAGE_DETAIL, IMAGE_REPRESENTATION_FORMAT
+from api.models import ImageStatus
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+BASE64_HEADER = ";base64,"
+WHITESPACE = re.compile(r"\s")
+# a regex scan of a 20 MB payload is slower than decoding it
+WHITESPACE_CHARS = ("\n", "\r", " ", "\t")
+# base64 chars decoded at once, a multiple of 4 keeps chunks aligned
+BASE64_CHUNK_SIZE = 64 * 1024
+# decoded uploads bigger than this are spooled to a temporary file
+SPOOL_MAX_SIZE = 1024 * 1024
+# image dimensions are looked for within the first decoded bytes only
+DIMENSIONS_PROBE_SIZE = 1024 * 1024
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Many field resolving all primary keys with one query.
+
+    Every invalid item is reported, not the first one only."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        self.child_relation.resolve(data)
+        values = []
+        errors = []
+        try:
+            for item in data:
+                try:
+                    values.append(self.child_relation.to_internal_value(item))
+                except serializers.ValidationError as exc:
+                    errors.extend(exc.detail)
+        finally:
+            self.child_relation.resolved = None
+        if errors:
+            raise serializers.ValidationError(errors)
+        return values
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field looked up in objects resolved beforehand.
+
+    BulkManyRelatedField and BulkListSerializer resolve the primary
+    keys of the whole list with one IN query, instead of a query per
+    item. A field used alone queries its object as usual."""
+
+    def __init__(self, **kwargs):
+        self.resolved = None
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        return self.get_queryset().model._meta.pk.to_python(data)
+
+    def resolve(self, items):
+        """Fetch the objects of the valid primary keys at once."""
+        pks = set()
+        for data in items:
+            try:
+                pks.add(self.to_pk(data))
+            except (
+                TypeError,
+                ValueError,
+                DjangoValidationError,
+                serializers.ValidationError,
+            ):
+                # reported by to_internal_value
+                continue
+        self.resolved = self.get_queryset().in_bulk(pks)
 
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        try:
+            return self.resolved[self.to_pk(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
 
-class PrimaryKeyRelatedFieldAlternative(serializers.PrimaryKeyRelatedField):
+
+class PrimaryKeyRelatedFieldAlternative(BulkPrimaryKeyRelatedField):
     def __init__(self, **kwargs):
         self.serializer = kwargs.pop("serializer", None)
         if self.serializer is not None and not issubclass(
@@ -18,3 +130,147 @@ class PrimaryKeyRelatedFieldAlternative(serializers.PrimaryKeyRelatedField):
         if self.serializer:
             return self.serializer(instance, context=self.context).data
         return super().to_representation(instance)
+
+
+class RecipeImageField(Base64FileField):
+    """Base64 recipe image, stored as uploaded.
+
+    The payload is decoded chunk by chunk into a spooled temporary file,
+    so there is no full-size bytes copy of the upload. Its decoded size
+    is checked before decoding and its pixel count as soon as the image
+    header is decoded. Only the header is parsed here, decoding and
+    resizing are left to the process_images worker. Represented by the
+    url of the processed variant once it is ready, by the upload until
+    then."""
+
+    ALLOWED_TYPES = ("jpg", "png", "gif", "webp")
+    INVALID_FILE_MESSAGE = "Please upload a valid image."
+    INVALID_TYPE_MESSAGE = "The type of the image couldn't be determined."
+    TOO_LARGE_MESSAGE = "The image must not be larger than {max_size} bytes."
+    TOO_MANY_PIXELS_MESSAGE = (
+        "The image must not have more than {max_pixels} pixels."
+    )
+
+    def __init__(self, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise serializers.ValidationError(
+                "Invalid type. This is not an base64 string: "
+                f"{type(base64_data)}"
+            )
+        # offsets instead of split, slicing would copy the whole payload
+        start = base64_data.find(BASE64_HEADER)
+        start = 0 if start == -1 else start + len(BASE64_HEADER)
+        if any(char in base64_data for char in WHITESPACE_CHARS):
+            base64_data = WHITESPACE.sub("", base64_data[start:])
+            start = 0
+
+        self.validate_size(base64_data, start)
+        image_file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            extension = self.decode(base64_data, start, image_file)
+        except serializers.ValidationError:
+            image_file.close()
+            raise
+        upload = File(image_file, name=f"{uuid.uuid4()}.{extension}")
+        upload.size = image_file.tell()
+        image_file.seek(0)
+        return super(Base64FieldMixin, self).to_internal_value(upload)
+
+    def validate_size(self, base64_data: str, start: int):
+        encoded_size = len(base64_data) - start
+        if encoded_size == 0 or encoded_size % 4:
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        padding = 0
+        if base64_data.endswith("=="):
+            padding = 2
+        elif base64_data.endswith("="):
+            padding = 1
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if encoded_size // 4 * 3 - padding > max_size:
+            raise serializers.ValidationError(
+                self.TOO_LARGE_MESSAGE.format(max_size=max_size)
+            )
+
+    def decode(self, base64_data: str, start: int, image_file) -> str:
+        """Write the decoded payload to the file, return its extension."""
+        extension = None
+        dimensions_checked = False
+        for position in range(start, len(base64_data), BASE64_CHUNK_SIZE):
+            end = position + BASE64_CHUNK_SIZE
+            try:
+                chunk = base64.b64decode(
+                    base64_data[position:end], validate=True
+                )
+            except binascii.Error:
+                raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+            image_file.write(chunk)
+            if extension is None:
+                extension = self.get_file_extension(None, chunk)
+                if extension not in self.ALLOWED_TYPES:
+                    raise serializers.ValidationError(
+                        self.INVALID_TYPE_MESSAGE
+                    )
+            if (
+                not dimensions_checked
+                and image_file.tell() <= DIMENSIONS_PROBE_SIZE
+            ):
+                dimensions_checked = self.validate_dimensions(image_file)
+        if not dimensions_checked:
+            self.validate_dimensions(image_file)
+        return extension
+
+    def validate_dimensions(self, image_file) -> bool:
+        """Check the pixel count if the decoded part has the header.
+
+        Returns False when the dimensions are not known yet."""
+        position = image_file.tell()
+        image_file.seek(0)
+        try:
+            # lazy, reads the header only
+            width, height = Image.open(image_file).size
+        except Image.DecompressionBombError:
+            width, height = settings.RECIPE_IMAGE_MAX_PIXELS + 1, 1
+        except (OSError, SyntaxError, ValueError):
+            return False
+        finally:
+            image_file.seek(position)
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if width * height > max_pixels:
+            raise serializers.ValidationError(
+                self.TOO_MANY_PIXELS_MESSAGE.format(max_pixels=max_pixels)
+            )
+        return True
+
+    def get_file_extension(self, filename, decoded_file):
+        for signature, extension in IMAGE_SIGNATURES:
+            if decoded_file.startswith(signature):
+                return extension
+        if decoded_file[:4] == b"RIFF" and decoded_file[8:12] == b"WEBP":
+            return "webp"
+        return None
+
+    def get_attribute(self, instance):
+        # the variants are stored on the recipe, next to the image
+        return instance
+
+    def to_representation(self, recipe):
+        variant = self.variant or self.context.get("image_variant")
+        path = None
+        if recipe.image_status == ImageStatus.READY:
+            path = (
+                recipe.image_variants.get(variant or IMAGE_DETAIL, {})
+                .get(IMAGE_REPRESENTATION_FORMAT)
+            )
+        if path is None:
+            return super().to_representation(recipe.image)
+        url = default_storage.url(path)
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
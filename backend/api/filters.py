@@ -1,15 +1,36 @@
 import django_filters
+from django import forms
+from django.db.models import Exists, OuterRef
 
-from api.constants import IS_FAVORITED_VALUES, IS_IN_SHOPING_CART_VALUES
-from api.models import Ingredient, Recipe, Tag
+from api.constants import (
+    INGREDIENT_SEARCH_LIMIT,
+    INGREDIENT_SEARCH_MAX_LIMIT,
+    INGREDIENT_SEARCH_MODES,
+    IS_FAVORITED_VALUES,
+    IS_IN_SHOPING_CART_VALUES,
+    RECIPE_TAGS_MATCH_MODES,
+)
+from api.models import Ingredient, Recipe
+from api.search import search_ingredients
+from api.tag_map import get_tag_ids
+
+
+class TagSlugsField(forms.MultipleChoiceField):
+    """Slugs of existing tags, checked against the cached tag map."""
+
+    def valid_value(self, value):
+        return value in get_tag_ids([value])
+
+
+class TagSlugsFilter(django_filters.MultipleChoiceFilter):
+    field_class = TagSlugsField
 
 
 class RecipeFilter(django_filters.FilterSet):
     author = django_filters.NumberFilter()
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name="tags__slug",
-        queryset=Tag.objects.all(),
-        to_field_name="slug",
+    tags = TagSlugsFilter(method="get_tags")
+    tags_match = django_filters.ChoiceFilter(
+        choices=RECIPE_TAGS_MATCH_MODES, method="get_tags_match"
     )
     is_favorited = django_filters.CharFilter(method="get_is_favorited")
     is_in_shopping_cart = django_filters.CharFilter(
@@ -20,6 +41,25 @@ class RecipeFilter(django_filters.FilterSet):
         model = Recipe
         fields = ("author", "tags", "is_favorited")
 
+    def get_tags(self, queryset, name, slugs):
+        """Recipes with any or all of the tags, EXISTS on the through table.
+
+        Unlike a join it yields every recipe once, however many of its
+        tags match. All of the tags is an EXISTS per tag, the planner
+        turns each into a semi-join that starts from the rarest tag
+        when that is cheaper."""
+        tag_ids = list(get_tag_ids(slugs).values())
+        tagged = Recipe.tags.through.objects.filter(recipe_id=OuterRef("pk"))
+        if self.form.cleaned_data.get("tags_match") == "all":
+            return queryset.filter(
+                *(Exists(tagged.filter(tag_id=tag_id)) for tag_id in tag_ids)
+            )
+        return queryset.filter(Exists(tagged.filter(tag_id__in=tag_ids)))
+
+    def get_tags_match(self, queryset, name, value):
+        # only tunes the tags filter
+        return queryset
+
     def get_is_favorited(self, queryset, name, value):
         if IS_FAVORITED_VALUES[value]:
             return queryset.filter(users_chose_as_favorite=self.request.user)
@@ -34,8 +74,29 @@ class RecipeFilter(django_filters.FilterSet):
 
 
 class IngredientFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr="istartswith")
+    name = django_filters.CharFilter(method="get_name")
+    search = django_filters.ChoiceFilter(
+        choices=INGREDIENT_SEARCH_MODES, method="get_search_option"
+    )
+    limit = django_filters.NumberFilter(
+        method="get_search_option",
+        min_value=1,
+        max_value=INGREDIENT_SEARCH_MAX_LIMIT,
+    )
 
     class Meta:
         model = Ingredient
         fields = ["name"]
+
+    def get_name(self, queryset, name, value):
+        limit = self.form.cleaned_data.get("limit")
+        if self.form.cleaned_data.get("search") == "fuzzy":
+            return search_ingredients(
+                queryset, value, int(limit or INGREDIENT_SEARCH_LIMIT)
+            )
+        queryset = queryset.filter(name__istartswith=value)
+        return queryset[: int(limit)] if limit else queryset
+
+    def get_search_option(self, queryset, name, value):
+        # search and limit only tune the name filter
+        return queryset
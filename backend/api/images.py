@@ -0,0 +1,112 @@
+import os
+from collections import Counter
+from io import BytesIO
+from typing import IO, Dict
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from api.constants import IMAGE_FORMATS, IMAGE_VARIANTS
+from api.models import ImageStatus, Recipe
+from api.response_cache import bump_recipes
+
+VARIANTS_DIR = "recipes/variants"
+
+
+def render_variants(image_file: IO[bytes]) -> Dict[str, Dict[str, bytes]]:
+    """Encode every variant of the image in every format.
+
+    Raises OSError (or its subclass Image.DecompressionBombError)
+    when the upload is not an image Pillow can decode."""
+    with Image.open(image_file) as image:
+        largest = max(max(size) for size in IMAGE_VARIANTS.values())
+        # lets the JPEG decoder scale down by 1/2..1/8 while decoding,
+        # much cheaper than resizing the full-size pixels afterwards
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        rendered = {}
+        # the smaller variants are resized from the bigger ones
+        by_size = sorted(
+            IMAGE_VARIANTS.items(), key=lambda item: max(item[1]), reverse=True
+        )
+        for variant, size in by_size:
+            image = image.copy()
+            image.thumbnail(size, Image.LANCZOS)
+            rendered[variant] = {}
+            for extension, (image_format, options) in IMAGE_FORMATS.items():
+                content = BytesIO()
+                image.save(content, image_format, **options)
+                rendered[variant][extension] = content.getvalue()
+    return rendered
+
+
+def save_variants(
+    recipe: Recipe, rendered: Dict[str, Dict[str, bytes]]
+) -> Dict[str, Dict[str, str]]:
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    paths = {}
+    for variant, contents in rendered.items():
+        paths[variant] = {}
+        for extension, content in contents.items():
+            paths[variant][extension] = default_storage.save(
+                f"{VARIANTS_DIR}/{recipe.pk}/{stem}-{variant}.{extension}",
+                ContentFile(content),
+            )
+    return paths
+
+
+def delete_variants(variants: Dict[str, Dict[str, str]]):
+    for paths in variants.values():
+        for path in paths.values():
+            default_storage.delete(path)
+
+
+def process_recipe_image(recipe: Recipe) -> str:
+    """Render the variants of the recipe image and record them.
+
+    The result is recorded only if the image was not replaced while it
+    was processed, the replacement is pending and is processed next."""
+    try:
+        with recipe.image.open("rb") as image_file:
+            rendered = render_variants(image_file)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        status, variants = ImageStatus.FAILED, {}
+    else:
+        status, variants = ImageStatus.READY, save_variants(recipe, rendered)
+
+    # update() skips auto_now, the image url changes with the variants
+    recorded = Recipe.objects.filter(
+        pk=recipe.pk, image=recipe.image.name
+    ).update(
+        image_status=status,
+        image_variants=variants,
+        updated_at=timezone.now(),
+    )
+    if recorded:
+        bump_recipes(recipe.pk)
+        delete_variants(recipe.image_variants)
+    else:
+        delete_variants(variants)
+    return status
+
+
+def process_pending_images(limit: int = None) -> Counter:
+    """Process recipes waiting for their image variants, oldest first.
+
+    Returns the number of processed images by the resulting status."""
+    recipes = Recipe.objects.filter(image_status=ImageStatus.PENDING)
+    recipes = recipes.only("pk", "image", "image_variants").order_by("pk")
+    processed = Counter()
+    for recipe in recipes[:limit]:
+        processed[process_recipe_image(recipe)] += 1
+    return processed
@@ -0,0 +1,81 @@
+import threading
+import time
+from bisect import bisect_left
+from sys import intern
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from api.models import Ingredient
+from api.versions import INGREDIENTS_CATALOG, get_version
+
+
+class IngredientIndex:
+    """Prefix index over the lowercased names of the ingredient catalog.
+
+    Names are kept sorted, so a prefix is a contiguous range found
+    with a binary search. Measurement units repeat a lot and are
+    interned."""
+
+    __slots__ = ("version", "keys", "rows")
+
+    def __init__(self, version: str, rows: Iterable[Tuple[int, str, str]]):
+        entries = sorted(
+            (name.lower(), pk, name, intern(measurement_unit))
+            for pk, name, measurement_unit in rows
+        )
+        self.version = version
+        self.keys = [key for key, *_ in entries]
+        self.rows = [tuple(row) for _, *row in entries]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prefix: str, limit: Optional[int] = None) -> List[dict]:
+        prefix = prefix.lower()
+        found = []
+        for position in range(bisect_left(self.keys, prefix), len(self)):
+            if not self.keys[position].startswith(prefix):
+                break
+            found.append(self.rows[position])
+        # the same order as IngredientViewSet.queryset
+        found.sort()
+        return [
+            {"id": pk, "name": name, "measurement_unit": measurement_unit}
+            for pk, name, measurement_unit in found[:limit]
+        ]
+
+
+_lock = threading.Lock()
+_index: Optional[IngredientIndex] = None
+_checked_at = 0.0
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """Index of the current process, rebuilt when the catalog changes.
+
+    The catalog version is looked up at most once per
+    INGREDIENT_INDEX_CHECK_INTERVAL seconds."""
+    global _index, _checked_at
+    with _lock:
+        now = time.monotonic()
+        interval = settings.INGREDIENT_INDEX_CHECK_INTERVAL
+        if _index is not None and now - _checked_at < interval:
+            return _index
+
+        # the version is read before the rows, a change in between
+        # only leads to one more rebuild
+        version = get_version(INGREDIENTS_CATALOG)
+        if _index is None or _index.version != version:
+            rows = Ingredient.objects.values_list(
+                "pk", "name", "measurement_unit__name"
+            )
+            _index = IngredientIndex(version, rows.iterator())
+        _checked_at = now
+        return _index
+
+
+def clear_ingredient_index():
+    global _index
+    with _lock:
+        _index = None
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.generate_dataset import BATCH_SIZE, generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk insert synthetic users, recipes, ingredient amounts, tags, "
+        "favorites, shopping carts and subscriptions, "
+        "deterministic for a seed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument(
+            "--users",
+            type=int,
+            help="Defaults to a user for every 10 recipes",
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe", type=float, default=10
+        )
+        parser.add_argument("--tags-per-recipe", type=float, default=2)
+        parser.add_argument("--favorites-per-user", type=float, default=400)
+        parser.add_argument("--cart-per-user", type=float, default=100)
+        parser.add_argument(
+            "--subscriptions-per-user", type=float, default=10
+        )
+        parser.add_argument(
+            "--popularity-skew",
+            type=float,
+            default=1.0,
+            help="Power law exponent of recipes, ingredients and tags "
+            "popularity, 0 for uniform",
+        )
+        parser.add_argument(
+            "--author-skew",
+            type=float,
+            default=0.8,
+            help="Power law exponent of the productivity of authors",
+        )
+        parser.add_argument(
+            "--tags", type=int, default=20, help="Tags to create if missing"
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=3 * 365,
+            help="Recipes are published over the days",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        if users is None:
+            users = max(options["recipes"] // 10, 1)
+        try:
+            generate_dataset(
+                recipes=options["recipes"],
+                users=users,
+                ingredients_per_recipe=options["ingredients_per_recipe"],
+                tags_per_recipe=options["tags_per_recipe"],
+                favorites_per_user=options["favorites_per_user"],
+                cart_per_user=options["cart_per_user"],
+                subscriptions_per_user=options["subscriptions_per_user"],
+                popularity_skew=options["popularity_skew"],
+                author_skew=options["author_skew"],
+                tags=options["tags"],
+                days=options["days"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                log=lambda message: self.stdout.write(message),
+            )
+        except ValueError as error:
+            raise CommandError(error)
@@ -0,0 +1,27 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.fill_db import BATCH_SIZE, load_ingredients
+
+
+class Command(BaseCommand):
+    help = "Load measurement units and ingredients from a JSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=os.path.join(
+                settings.BASE_DIR, "utils", "ingredients.json"
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        loaded = load_ingredients(options["path"], options["batch_size"])
+        for name, (inserted, skipped) in loaded.items():
+            self.stdout.write(
+                f"{name}: {inserted} inserted, {skipped} skipped"
+            )
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.images import process_pending_images
+
+
+class Command(BaseCommand):
+    help = "Render card and detail variants of uploaded recipe images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the pending images and exit instead of polling",
+        )
+        parser.add_argument("--batch-size", type=int, default=10)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            processed = process_pending_images(options["batch_size"])
+            for status, number in processed.items():
+                self.stdout.write(f"{status}: {number}")
+            if options["once"] and not processed:
+                return
+            if not processed:
+                time.sleep(settings.IMAGE_WORKER_POLL_INTERVAL)
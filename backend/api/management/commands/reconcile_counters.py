@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import reconcile_counters
+from api.models import Recipe, Subscription
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount favorites and shopping cart counters of recipes, "
+        "recipes and followers counters of users"
+    )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters(Recipe, CustomUser, Subscription)
+        for counter, number_rows in fixed.items():
+            self.stdout.write(f"{counter}: {number_rows} fixed")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.response_cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Show hits and misses of the anonymous response cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Start counting from zero after showing the counters",
+        )
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0
+        self.stdout.write(
+            f"hits: {stats['hits']}, misses: {stats['misses']}, "
+            f"hit ratio: {ratio:.1%}"
+        )
+        if options["reset"]:
+            reset_stats()
@@ -0,0 +1,77 @@
+import hashlib
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+def fingerprint(sql: str) -> str:
+    """Short hash of a query without its parameters.
+
+    Queries of an N+1 loop differ only in parameters and share
+    a fingerprint. IN lists of any length are collapsed."""
+    normalized = IN_LIST.sub("IN (...)", sql)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:8]
+
+
+class QueryRecorder:
+    """Execute wrapper counting queries, their time and fingerprints."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+            self.queries.append(sql)
+
+    @property
+    def duplicates(self) -> dict:
+        return {
+            key: number
+            for key, number in self.fingerprints.most_common()
+            if number > 1
+        }
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+class QueryInstrumentationMiddleware:
+    """Report queries made by a request in the response headers.
+
+    Enabled with the QUERY_INSTRUMENTATION setting only, the headers
+    are meant for local profiling, not for production clients."""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder().record() as recorder:
+            response = self.get_response(request)
+        response["X-Query-Count"] = str(recorder.count)
+        response["X-Query-Time"] = f"{recorder.duration * 1000:.2f}"
+        response["X-Query-Duplicates"] = ", ".join(
+            f"{key}*{number}" for key, number in recorder.duplicates.items()
+        )
+        return response
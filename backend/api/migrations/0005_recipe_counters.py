@@ -0,0 +1,35 @@
+# Generated by Django 3.2.7 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+from api.counters import reconcile_counters
+
+
+def fill_counters(apps, schema_editor):
+    reconcile_counters(
+        apps.get_model("api", "Recipe"),
+        apps.get_model("users", "CustomUser"),
+        apps.get_model("api", "Subscription"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_recipe_pub_date_id_idx'),
+        ('users', '0003_customuser_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в корзину'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.7 on 2026-10-18 03:42
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model("api", "Ingredient")
+    AmountIngredient = apps.get_model("api", "AmountIngredient")
+    duplicates = (
+        Ingredient.objects.values("name", "measurement_unit")
+        .annotate(kept=Min("pk"), number=Count("pk"))
+        .filter(number__gt=1)
+    )
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate["name"],
+            measurement_unit=duplicate["measurement_unit"],
+        ).exclude(pk=duplicate["kept"])
+        AmountIngredient.objects.filter(ingredient__in=extra).update(
+            ingredient_id=duplicate["kept"]
+        )
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique ingredient'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.7 on 2026-10-18 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('pending', 'Ожидает обработки'), ('ready', 'Обработано'), ('failed', 'Ошибка обработки')], db_index=True, default='pending', editable=False, max_length=16, verbose_name='Статус обработки изображения'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Варианты изображения'),
+        ),
+    ]
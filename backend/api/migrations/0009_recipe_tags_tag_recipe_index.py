@@ -0,0 +1,24 @@
+from django.db import migrations
+
+INDEX_NAME = "api_recipe_tags_tag_recipe_idx"
+
+
+class Migration(migrations.Migration):
+    """Index of the tags filter on the auto-created through table.
+
+    Its unique (recipe_id, tag_id) index serves the EXISTS probe per
+    recipe. When the tags are rare the planner starts from the tags
+    instead, and (tag_id, recipe_id) covers that side without
+    visiting the table."""
+
+    dependencies = [
+        ("api", "0008_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"CREATE INDEX {INDEX_NAME} "
+            "ON api_recipe_tags (tag_id, recipe_id)",
+            f"DROP INDEX {INDEX_NAME}",
+        ),
+    ]
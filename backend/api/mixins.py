@@ -1,5 +1,11 @@
+from typing import Optional
+
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import mixins, viewsets
 
+from api.models import Recipe
+from api.validations import ValidationResult
+
 
 class ListRetrievDestroyViewSet(
     mixins.RetrieveModelMixin,
@@ -16,3 +22,34 @@ class ListRetrievViewSet(
     viewsets.GenericViewSet,
 ):
     pass
+
+
+class LeadersRecipesMixin:
+    """Recipes of serialized leaders, cut by the recipes_limit param."""
+
+    def validate_recipes_limit(self):
+        recipes_limit: str = self.request.query_params.get("recipes_limit")
+        if recipes_limit is not None and (
+            not recipes_limit.isdigit() or int(recipes_limit) == 0
+        ):
+            return ValidationResult(
+                False,
+                "recipes_limit",
+                "Invalid value. Acceptable positive integer",
+            )
+        return ValidationResult(True, "recipes_limit", "")
+
+    def get_recipes_limit(self) -> Optional[int]:
+        recipes_limit = self.request.query_params.get("recipes_limit")
+        return int(recipes_limit) if recipes_limit else None
+
+    def prefetch_recipes(self, leaders):
+        recipes_limit = self.get_recipes_limit()
+        recipes = Recipe.objects.all()
+        if recipes_limit is not None:
+            recipes = recipes.latest_by_authors(
+                [leader.pk for leader in leaders], recipes_limit
+            )
+        prefetch_related_objects(
+            leaders, Prefetch("recipes", queryset=recipes)
+        )
@@ -3,9 +3,13 @@ from colorfield.fields import ColorField
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Value, Window
 from django.db.models.constraints import CheckConstraint
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.db.models.query_utils import Q
 
+from api.counters import RECIPE_CATEGORY_COUNTERS
 from api.utilis import transliterate_slugify
 from users.models import CustomUser
 
@@ -37,6 +41,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique ingredient",
+            )
+        ]
 
     def __str__(self):
         return f"{self.name} {self.measurement_unit.name}"
@@ -66,6 +76,86 @@ class Tag(models.Model):
         return self.name
 
 
+class ImageStatus(models.TextChoices):
+    PENDING = "pending", "Ожидает обработки"
+    READY = "ready", "Обработано"
+    FAILED = "failed", "Ошибка обработки"
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        """Annotate is_favorited and is_in_shopping_cart for the user."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        favorites = Recipe.users_chose_as_favorite.through.objects.filter(
+            recipe=OuterRef("pk"), customuser=user
+        )
+        cart = Recipe.users_put_in_cart.through.objects.filter(
+            recipe=OuterRef("pk"), customuser=user
+        )
+        return self.annotate(
+            is_favorited=Exists(favorites),
+            is_in_shopping_cart=Exists(cart),
+        )
+
+    def minified(self):
+        """Only the columns RecipeMinifiedSerializer shows."""
+        return self.only(
+            "id",
+            "name",
+            "image",
+            "image_status",
+            "image_variants",
+            "cooking_time",
+        )
+
+    def for_read(self, user):
+        """Everything RecipeSerializer needs in a fixed number of queries."""
+        authors = CustomUser.objects.annotate(
+            is_subscribed=subscribed_by(user)
+        )
+        amounts = AmountIngredient.objects.select_related(
+            "ingredient__measurement_unit"
+        )
+        return self.with_user_flags(user).prefetch_related(
+            "tags",
+            Prefetch("author", queryset=authors),
+            Prefetch("amounts_ingredients", queryset=amounts),
+        )
+
+    def latest_by_authors(self, authors_ids, limit: int):
+        """At most limit latest recipes of each author in one query.
+
+        Recipes are ranked with ROW_NUMBER() OVER (PARTITION BY author),
+        the ranked subquery is wrapped by hand as Django can't filter
+        on window functions yet."""
+        ranked = (
+            self.filter(author_id__in=authors_ids)
+            .order_by()
+            .annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=[F("author_id")],
+                    order_by=[F("pub_date").desc(), F("id").desc()],
+                )
+            )
+            .values("id", "row_number")
+        )
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(
+            pk__in=RawSQL(
+                f'SELECT "id" FROM ({sql}) AS "ranked"'
+                ' WHERE "row_number" <= %s',
+                (*params, limit),
+            )
+        )
+
+
 class Recipe(models.Model):
     name = models.CharField(
         verbose_name="Название",
@@ -100,6 +190,20 @@ class Recipe(models.Model):
         upload_to=r"recipes/%Y/%m/%d/",
         verbose_name="Изображение",
     )
+    image_status = models.CharField(
+        verbose_name="Статус обработки изображения",
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.PENDING,
+        db_index=True,
+        editable=False,
+    )
+    # {variant: {format: path in the storage}}, filled by process_images
+    image_variants = models.JSONField(
+        verbose_name="Варианты изображения",
+        default=dict,
+        editable=False,
+    )
     text = models.TextField(verbose_name="Описание")
     cooking_time = models.PositiveIntegerField(
         verbose_name="Время приготовления в минутах",
@@ -108,20 +212,55 @@ class Recipe(models.Model):
         verbose_name="Дата публикации",
         auto_now_add=True,
     )
+    # validator of conditional GETs, changes of the related rows
+    # shown in the recipe are tracked by CacheVersion
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+        db_index=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="Количество добавлений в избранное",
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name="Количество добавлений в корзину",
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            # keyset pagination of the recipe feed
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+        ]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
 
     def __str__(self):
         return self.name
 
-    @property
-    def count_favorite(self) -> int:  # noqa CCE001
-        return self.users_put_in_cart.count()
-
-    count_favorite.fget.short_description = "Количество добавлений в избранное"
+    def save(self, *args, **kwargs):
+        # the counters are kept up to date with F() updates, a full save
+        # of a recipe loaded earlier must not write them back
+        if (
+            kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+        ):
+            counters = RECIPE_CATEGORY_COUNTERS.values()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in counters
+            ]
+        super().save(*args, **kwargs)
 
 
 class AmountIngredient(models.Model):
@@ -183,3 +322,32 @@ class Subscription(models.Model):
             errors = {}
             errors["follower"] = "User cannot subscribe to himself"
             raise ValidationError(errors)
+
+
+def subscribed_by(user):
+    """Expression telling whether the user follows the outer user row."""
+    if user.is_anonymous:
+        return Value(False, output_field=models.BooleanField())
+    return Exists(
+        Subscription.objects.filter(leader=OuterRef("pk"), follower=user)
+    )
+
+
+class CacheVersion(models.Model):
+    key = models.CharField(
+        verbose_name="Ключ",
+        max_length=64,
+        primary_key=True,
+    )
+    version = models.CharField(verbose_name="Версия", max_length=32)
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = "Версия данных"
+        verbose_name_plural = "Версии данных"
+
+    def __str__(self):
+        return f"{self.key} {self.version}"
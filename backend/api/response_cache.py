@@ -0,0 +1,161 @@
+import hashlib
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from api.versions import bump_versions, get_versions
+
+CACHE_ALIAS = "responses"
+# tags, authors and the ingredients catalog are shown in every recipe
+SHARED = "shared"
+RECIPES = "recipes"
+STORED_HEADERS = ("ETag", "Last-Modified", "Vary")
+STATS = ("hits", "misses")
+
+
+def recipe_generation(pk) -> str:
+    return f"recipe:{pk}"
+
+
+def get_generations(names: Iterable[str]) -> List[str]:
+    """Current tokens of the generations, one query.
+
+    The tokens are CacheVersion rows, not cache entries: a bump made by
+    any process, the image worker and management commands among them,
+    reaches every process whatever the backend of the cache is."""
+    keys = [f"generation:{name}" for name in names]
+    versions = get_versions(*keys)
+    return [
+        versions[key].version if key in versions else "" for key in keys
+    ]
+
+
+def bump_generations(*names: str):
+    """Invalidate cached responses of the generations.
+
+    The new token is committed with the change, a response rendered
+    from the rows before the commit is cached under the old one."""
+    bump_versions(*(f"generation:{name}" for name in names))
+
+
+def bump_recipes(*pks):
+    bump_generations(RECIPES, *(recipe_generation(pk) for pk in pks))
+
+
+def count(name: str):
+    cache = caches[CACHE_ALIAS]
+    key = f"stats:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_stats() -> Dict[str, int]:
+    cache = caches[CACHE_ALIAS]
+    stats = cache.get_many([f"stats:{name}" for name in STATS])
+    return {name: stats.get(f"stats:{name}", 0) for name in STATS}
+
+
+def reset_stats():
+    caches[CACHE_ALIAS].delete_many([f"stats:{name}" for name in STATS])
+
+
+def get_cache_key(request, generations: Iterable[str]) -> str:
+    # the order of parameters and of repeated values changes nothing
+    query = urlencode(
+        sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+    )
+    # links to other pages and images are absolute
+    url = f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+    variant = f"{request.accepted_media_type}|{url}|{'|'.join(generations)}"
+    return "response:" + hashlib.md5(variant.encode()).hexdigest()
+
+
+def cached_response(request, entry: dict) -> HttpResponse:
+    headers = entry["headers"]
+    response = get_conditional_response(
+        request,
+        etag=headers.get("ETag"),
+        last_modified=parse_http_date_safe(headers.get("Last-Modified", "")),
+    )
+    if response is None:
+        response = HttpResponse(
+            entry["content"], content_type=entry["content_type"]
+        )
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def lookup(view, request) -> Tuple[str, Optional[HttpResponse]]:
+    """Cache key of the response of the view and the cached response.
+
+    A found response is counted as a hit, a miss is left to the caller
+    that renders the response."""
+    # the async views look the response up before the view does, the
+    # key is kept on the request to read the generations once
+    http_request = request._request
+    key = getattr(http_request, "response_cache_key", None)
+    if key is None:
+        key = get_cache_key(
+            request, get_generations(view.get_cache_generations())
+        )
+        http_request.response_cache_key = key
+    entry = caches[CACHE_ALIAS].get(key)
+    if entry is None:
+        return key, None
+    count("hits")
+    response = cached_response(request, entry)
+    response["X-Cache"] = "HIT"
+    return key, response
+
+
+def cache_anonymous(method):
+    """Cache the responses of a view method to anonymous users.
+
+    The view names the generations the response depends on in
+    get_cache_generations(), any of them bumped is a miss."""
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return method(self, request, *args, **kwargs)
+        key, response = lookup(self, request)
+        if response is not None:
+            return response
+
+        count("misses")
+        cache = caches[CACHE_ALIAS]
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+
+            def store(rendered):
+                cache.set(
+                    key,
+                    {
+                        "content": rendered.content,
+                        "content_type": rendered["Content-Type"],
+                        "headers": {
+                            header: rendered[header]
+                            for header in STORED_HEADERS
+                            if rendered.has_header(header)
+                        },
+                    },
+                )
+
+            response.add_post_render_callback(store)
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
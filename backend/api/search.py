@@ -0,0 +1,88 @@
+import re
+from typing import Set
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import (
+    BooleanField,
+    Case,
+    ExpressionWrapper,
+    Q,
+    QuerySet,
+    When,
+)
+from django.db.models.functions import Upper
+
+# the default pg_trgm.similarity_threshold used by the % operator
+TRIGRAM_THRESHOLD = 0.3
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def get_trigrams(text: str) -> Set[str]:
+    """Trigrams of the text the way pg_trgm extracts them."""
+    trigrams = set()
+    for word in WORD_PATTERN.findall(text.lower().replace("_", " ")):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            trigrams.add(padded[i:i + 3])
+    return trigrams
+
+
+def trigram_similarity(first: str, second: str) -> float:
+    first_trigrams = get_trigrams(first)
+    second_trigrams = get_trigrams(second)
+    union = first_trigrams | second_trigrams
+    if not union:
+        return 0.0
+    return len(first_trigrams & second_trigrams) / len(union)
+
+
+def search_postgresql(queryset: QuerySet, text: str, limit: int) -> QuerySet:
+    # matches the GIN index on UPPER(name) gin_trgm_ops, which serves
+    # both LIKE and the % similarity operator
+    needle = text.upper()
+    return (
+        queryset.annotate(
+            upper_name=Upper("name"),
+            similarity=TrigramSimilarity(Upper("name"), needle),
+        )
+        .annotate(
+            is_prefix=ExpressionWrapper(
+                Q(upper_name__startswith=needle), output_field=BooleanField()
+            )
+        )
+        .filter(
+            Q(upper_name__contains=needle)
+            | Q(upper_name__trigram_similar=needle)
+        )
+        .order_by("-is_prefix", "-similarity", "name", "pk")[:limit]
+    )
+
+
+def search_python(queryset: QuerySet, text: str, limit: int) -> QuerySet:
+    # SQLite has neither trigrams nor unicode aware LIKE,
+    # the catalog is small enough to be ranked in python
+    needle = text.lower()
+    matches = []
+    for pk, name in queryset.values_list("pk", "name").iterator():
+        lowered = name.lower()
+        is_prefix = lowered.startswith(needle)
+        similarity = trigram_similarity(lowered, needle)
+        if needle in lowered or similarity >= TRIGRAM_THRESHOLD:
+            matches.append((not is_prefix, -similarity, name, pk))
+    matches.sort()
+    ids = [pk for *_, pk in matches[:limit]]
+    if not ids:
+        return queryset.none()
+    order = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ids)]
+    )
+    return queryset.filter(pk__in=ids).order_by(order)
+
+
+def search_ingredients(queryset: QuerySet, text: str, limit: int) -> QuerySet:
+    """Prefix matches first, then fuzzy matches by trigram similarity."""
+    if connections[queryset.db].vendor == "postgresql":
+        return search_postgresql(queryset, text, limit)
+    return search_python(queryset, text, limit)
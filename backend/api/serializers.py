@@ -1,10 +1,15 @@
 from django.db import transaction
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.fields import CharField
 
-from api.fields import PrimaryKeyRelatedFieldAlternative
-from api.models import AmountIngredient, Ingredient, Recipe, Tag
+from api.constants import IMAGE_CARD, RECIPES_BATCH_MAX_SIZE
+from api.fields import (
+    BulkPrimaryKeyRelatedField,
+    PrimaryKeyRelatedFieldAlternative,
+    RecipeImageField,
+)
+from api.models import AmountIngredient, ImageStatus, Ingredient, Recipe, Tag
+from api.shopping_list import bump_shopping_cart_version
 from api.utilis import is_distinct
 from users.models import CustomUser
 from users.serializers import CustomUserSerializer
@@ -39,8 +44,35 @@ class TagSerializer(serializers.ModelSerializer):
         optional_fields = ["color", "slug"]
 
 
+class BulkListSerializer(serializers.ListSerializer):
+    """List of items whose related fields are resolved together.
+
+    The primary keys of every BulkPrimaryKeyRelatedField of the child
+    are fetched with one query for the whole list."""
+
+    def to_internal_value(self, data):
+        fields = []
+        if isinstance(data, list):
+            fields = [
+                field
+                for field in self.child._writable_fields
+                if isinstance(field, BulkPrimaryKeyRelatedField)
+            ]
+        for field in fields:
+            field.resolve(
+                item[field.field_name]
+                for item in data
+                if isinstance(item, dict) and field.field_name in item
+            )
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields:
+                field.resolved = None
+
+
 class AmountIngredientRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         required=True, queryset=Ingredient.objects.all()
     )
     name = CharField(read_only=True, source="ingredient.name")
@@ -56,12 +88,13 @@ class AmountIngredientRecipeSerializer(serializers.ModelSerializer):
             "measurement_unit",
             "amount",
         )
+        list_serializer_class = BulkListSerializer
 
 
 class AmountIngredientRecipeCreateUpdateSerializer(
     serializers.ModelSerializer
 ):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         required=True, queryset=Ingredient.objects.all()
     )
     amount = serializers.FloatField(required=True)
@@ -72,10 +105,11 @@ class AmountIngredientRecipeCreateUpdateSerializer(
             "id",
             "amount",
         )
+        list_serializer_class = BulkListSerializer
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = RecipeImageField(variant=IMAGE_CARD)
 
     class Meta:
         model = Recipe
@@ -87,6 +121,14 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RECIPES_BATCH_MAX_SIZE,
+    )
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(required=False)
     tags = TagSerializer(many=True)
@@ -95,7 +137,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -113,12 +155,21 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, current_recipe):
+        # annotated by Recipe.objects.for_read on the read path
+        is_favorited = getattr(current_recipe, "is_favorited", None)
+        if is_favorited is not None:
+            return is_favorited
         user = self.context["request"].user
         return current_recipe.users_chose_as_favorite.filter(
             id=user.pk
         ).exists()
 
     def get_is_in_shopping_cart(self, current_recipe):
+        is_in_shopping_cart = getattr(
+            current_recipe, "is_in_shopping_cart", None
+        )
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
         user = self.context["request"].user
         return current_recipe.users_put_in_cart.filter(id=user.pk).exists()
 
@@ -155,16 +206,69 @@ class RecipeCreateUpdateSerializer(RecipeSerializer):
             self.save_ingredients(saved_recipe, amounts_ingredients)
         return saved_recipe
 
+    def update_ingredients(self, recipe, amounts_ingredients) -> bool:
+        """Write only the changed amounts, True if any was changed.
+
+        Amounts of kept ingredients are updated in place, so their rows
+        aren't deleted and inserted again on every edit."""
+        stored = {
+            amount_ingredient.ingredient_id: amount_ingredient
+            for amount_ingredient in recipe.amounts_ingredients.all()
+        }
+        created = []
+        changed = []
+        for amount_ingredient in amounts_ingredients:
+            amount = amount_ingredient["amount"]
+            ingredient = amount_ingredient["id"]
+            stored_amount = stored.pop(ingredient.pk, None)
+            if stored_amount is None:
+                created.append(
+                    AmountIngredient(
+                        amount=amount, recipe=recipe, ingredient=ingredient
+                    )
+                )
+            elif stored_amount.amount != amount:
+                stored_amount.amount = amount
+                changed.append(stored_amount)
+        # what is left in stored was removed from the recipe
+        if stored:
+            AmountIngredient.objects.filter(
+                pk__in=[removed.pk for removed in stored.values()]
+            ).delete()
+        AmountIngredient.objects.bulk_update(changed, ["amount"])
+        AmountIngredient.objects.bulk_create(created)
+        return bool(stored or changed or created)
+
+    def update_tags(self, recipe, tags):
+        stored_ids = {tag.pk for tag in recipe.tags.all()}
+        ids = {tag.pk for tag in tags}
+        if ids == stored_ids:
+            return
+        recipe.tags.remove(*(stored_ids - ids))
+        recipe.tags.add(*(ids - stored_ids))
+
     def update(self, recipe, validated_data):
         # the transaction is needed to rollback the creation of amounts
         with transaction.atomic():
             amounts_ingredients = validated_data.pop(
                 "amounts_ingredients", None
             )
+            tags = validated_data.pop("tags", None)
+            if "image" in validated_data:
+                # the new upload is served as is until its variants
+                # are rendered by process_images
+                validated_data["image_status"] = ImageStatus.PENDING
             saved_recipe = super().update(recipe, validated_data)
-            if amounts_ingredients:
-                saved_recipe.amounts_ingredients.all().delete()
-                self.save_ingredients(recipe, amounts_ingredients)
+            if tags is not None:
+                self.update_tags(saved_recipe, tags)
+            if amounts_ingredients and self.update_ingredients(
+                saved_recipe, amounts_ingredients
+            ):
+                bump_shopping_cart_version(
+                    CustomUser.objects.filter(
+                        shopping_cart_recipes=saved_recipe
+                    )
+                )
         return saved_recipe
 
     def validate_ingredients(self, amounts_ingredients):
@@ -201,7 +305,7 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
     last_name = serializers.CharField(read_only=True)
     is_subscribed = serializers.SerializerMethodField()
     recipes = RecipeMinifiedSerializer(many=True)
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = CustomUser
@@ -217,6 +321,10 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, leader) -> bool:
+        # annotated by SubscriptionList.get_queryset
+        is_subscribed = getattr(leader, "is_subscribed", None)
+        if is_subscribed is not None:
+            return is_subscribed
         request = self.context.get("request")
         if request:
             request_user = request.user
@@ -226,5 +334,106 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
             follower=request_user
         ).exists()
 
-    def get_recipes_count(self, leader) -> int:
-        return leader.recipes.count()
+
+def text(value):
+    return None if value is None else str(value)
+
+
+def get_related(instance, name: str):
+    """Rows of the relation, prefetched ones without a related manager.
+
+    Creating the manager of recipe.tags costs more than rendering a
+    tag."""
+    try:
+        return instance._prefetched_objects_cache[name]
+    except (AttributeError, KeyError):
+        return getattr(instance, name).all()
+
+
+class CompiledTagSerializer(serializers.BaseSerializer):
+    """Read-only TagSerializer building the dict directly.
+
+    Renders the same JSON as TagSerializer without its field by field
+    machinery."""
+
+    def to_representation(self, tag):
+        return {
+            "id": tag.pk,
+            "name": text(tag.name),
+            "color": text(tag.color),
+            "slug": text(tag.slug),
+        }
+
+
+class CompiledIngredientSerializer(serializers.BaseSerializer):
+    """Read-only IngredientSerializer building the dict directly."""
+
+    def to_representation(self, ingredient):
+        measurement_unit = ingredient.measurement_unit
+        return {
+            "id": ingredient.pk,
+            "name": text(ingredient.name),
+            "measurement_unit": (
+                None if measurement_unit is None else measurement_unit.name
+            ),
+        }
+
+
+class CompiledRecipeSerializer(serializers.BaseSerializer):
+    """Read-only RecipeSerializer building the dicts directly.
+
+    Expects the recipes of Recipe.objects.for_read, the flags and the
+    related rows are queried one by one otherwise. Checked against
+    RecipeSerializer by tests_serializers."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image = RecipeImageField(read_only=True)
+        self.image.bind("image", self)
+        self.tag = CompiledTagSerializer()
+
+    def get_author(self, author):
+        if author is None:
+            return None
+        return {
+            "email": text(author.email),
+            "id": author.pk,
+            "username": text(author.username),
+            "first_name": text(author.first_name),
+            "last_name": text(author.last_name),
+            # the methods only need the context of the serializer
+            "is_subscribed": CustomUserSerializer.get_is_subscribed(
+                self, author
+            ),
+        }
+
+    def to_representation(self, recipe):
+        return {
+            "id": recipe.pk,
+            "name": text(recipe.name),
+            "tags": [
+                self.tag.to_representation(tag)
+                for tag in get_related(recipe, "tags")
+            ],
+            "author": self.get_author(recipe.author),
+            "is_favorited": RecipeSerializer.get_is_favorited(self, recipe),
+            "is_in_shopping_cart": RecipeSerializer.get_is_in_shopping_cart(
+                self, recipe
+            ),
+            "ingredients": [
+                {
+                    "id": amount_ingredient.pk,
+                    "name": text(amount_ingredient.ingredient.name),
+                    "measurement_unit": text(
+                        amount_ingredient.ingredient.measurement_unit
+                    ),
+                    "amount": float(amount_ingredient.amount),
+                }
+                for amount_ingredient in get_related(
+                    recipe, "amounts_ingredients"
+                )
+            ],
+            "image": self.image.to_representation(recipe),
+            "text": text(recipe.text),
+            "cooking_time": recipe.cooking_time,
+        }
@@ -0,0 +1,131 @@
+import os
+from functools import lru_cache
+from typing import Callable, Iterable
+
+from django.core.cache import caches
+from django.db.models import F, QuerySet
+from fpdf import FPDF
+
+FONT_FAMILY = "DejaVu"
+FONT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "fonts",
+    "DejaVuSansCondensed.ttf",
+)
+FONT_SIZE = 14
+LINE_HEIGHT = 10
+CACHE_ALIAS = "shopping_lists"
+
+
+class GlyphSubset(list):
+    """Used glyphs of a unicode font.
+
+    FPDF appends every printed char to the subset and later checks
+    ``cid not in subset`` for each glyph of the font, which is quadratic
+    in the text length. Keeping the list unique and backing membership
+    checks with a set makes both linear."""
+
+    def __init__(self, glyphs=()):
+        super().__init__()
+        self._glyphs = set()
+        for glyph in glyphs:
+            self.append(glyph)
+
+    def __contains__(self, glyph):
+        return glyph in self._glyphs
+
+    def __delitem__(self, index):
+        removed = self[index]
+        super().__delitem__(index)
+        if not isinstance(index, slice):
+            removed = [removed]
+        self._glyphs.difference_update(removed)
+
+    def append(self, glyph):
+        if glyph not in self._glyphs:
+            self._glyphs.add(glyph)
+            super().append(glyph)
+
+
+@lru_cache(maxsize=None)
+def get_font_metrics() -> tuple:
+    """Parse the unicode font once per process.
+
+    Returns the ``fonts`` and ``font_files`` entries that FPDF.add_font
+    registers, so every next document can reuse them without
+    unpickling the metrics again."""
+    pdf = FPDF()
+    pdf.add_font(FONT_FAMILY, "", FONT_PATH, uni=True)
+    for font in pdf.fonts.values():
+        # the bundled .pkl keeps the path relative to the original cwd
+        font["ttffile"] = FONT_PATH
+    return pdf.fonts, pdf.font_files
+
+
+class ShoppingListPDF(FPDF):
+    def __init__(self):
+        super().__init__()
+        fonts, font_files = get_font_metrics()
+        # the subset of used glyphs is mutated while rendering,
+        # the rest of the metrics (char widths) is shared read-only
+        self.fonts = {
+            key: {**font, "subset": GlyphSubset(font["subset"])}
+            for key, font in fonts.items()
+        }
+        self.font_files = dict(font_files)
+        self.set_font(FONT_FAMILY, "", FONT_SIZE)
+
+    def add_lines(self, lines: Iterable[str]):
+        if self.page == 0:
+            self.add_page()
+        for line in lines:
+            self.cell(0, LINE_HEIGHT, txt=line, ln=1)
+
+
+def format_ingredient(ingredient: dict) -> str:
+    return (
+        f'{ingredient["name"]} {ingredient["amount"]}'
+        f' {ingredient["measurement_unit"]}'
+    )
+
+
+def render_shopping_list(ingredients: Iterable[dict]) -> bytes:
+    """Render rows with name, amount and measurement_unit into a PDF."""
+    pdf = ShoppingListPDF()
+    pdf.add_lines(format_ingredient(ingredient) for ingredient in ingredients)
+    # FPDF keeps the document as a latin1 str, encoding it is the only
+    # copy left before the response
+    return pdf.output(dest="S").encode("latin1")
+
+
+def render_shopping_list_text(ingredients: Iterable[dict]) -> bytes:
+    lines = (format_ingredient(ingredient) for ingredient in ingredients)
+    return "\n".join(lines).encode("utf-8")
+
+
+RENDERERS = {
+    "pdf": render_shopping_list,
+    "txt": render_shopping_list_text,
+}
+
+
+def get_shopping_list(
+    user, file_type: str, get_ingredients: Callable[[], Iterable[dict]]
+) -> bytes:
+    """Rendered shopping list of the user, cached per cart version."""
+    cache = caches[CACHE_ALIAS]
+    # the user of a cached token lookup may hold an older version
+    user.refresh_from_db(fields=["shopping_cart_version"])
+    key = (
+        f"shopping-list:{user.pk}:{user.shopping_cart_version}:{file_type}"
+    )
+    content = cache.get(key)
+    if content is None:
+        content = RENDERERS[file_type](get_ingredients())
+        cache.set(key, content)
+    return content
+
+
+def bump_shopping_cart_version(users: QuerySet):
+    """Invalidate cached shopping lists of the users."""
+    users.update(shopping_cart_version=F("shopping_cart_version") + 1)
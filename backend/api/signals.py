@@ -0,0 +1,116 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.counters import increment
+from api.models import (
+    AmountIngredient,
+    Ingredient,
+    MeasurementUnit,
+    Recipe,
+    Subscription,
+    Tag,
+)
+from api.response_cache import SHARED, bump_generations, bump_recipes
+from api.tag_map import forget_tag_map
+from api.versions import (
+    INGREDIENTS_CATALOG,
+    RECIPES_DELETED,
+    TAGS,
+    USERS,
+    bump_version,
+)
+from users.models import CustomUser
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=MeasurementUnit)
+@receiver(post_delete, sender=MeasurementUnit)
+def bump_ingredients_catalog_version(sender, **kwargs):
+    bump_version(INGREDIENTS_CATALOG)
+    bump_generations(SHARED)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_version(TAGS)
+    bump_generations(SHARED)
+    forget_tag_map()
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_users_version(sender, created, update_fields, **kwargs):
+    # new users are in no recipe yet, logins change no shown field
+    if created or update_fields == frozenset(["last_login"]):
+        return
+    bump_version(USERS)
+    bump_generations(SHARED)
+
+
+@receiver(post_delete, sender=CustomUser)
+def bump_users_version_on_delete(sender, **kwargs):
+    bump_version(USERS)
+    bump_generations(SHARED)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def bump_recipe_generation(sender, instance, **kwargs):
+    bump_recipes(instance.pk)
+
+
+@receiver(post_save, sender=AmountIngredient)
+@receiver(post_delete, sender=AmountIngredient)
+def bump_amount_recipe_generation(sender, instance, **kwargs):
+    bump_recipes(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_tagged_recipes_generation(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        bump_recipes(instance.pk)
+    elif pk_set:
+        bump_recipes(*pk_set)
+    else:
+        # tag.recipes.clear() names no recipes
+        bump_generations(SHARED)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            CustomUser.objects.filter(pk=instance.author_id), "recipes_count"
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    increment(
+        CustomUser.objects.filter(pk=instance.author_id), "recipes_count", -1
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def bump_recipes_deleted_version(sender, **kwargs):
+    bump_version(RECIPES_DELETED)
+
+
+@receiver(post_save, sender=Subscription)
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            CustomUser.objects.filter(pk=instance.leader_id), "followers_count"
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_followers_count(sender, instance, **kwargs):
+    increment(
+        CustomUser.objects.filter(pk=instance.leader_id), "followers_count", -1
+    )
@@ -0,0 +1,50 @@
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from api.models import Tag
+from api.versions import TAGS, get_version
+
+CACHE_KEY = "tag-map"
+
+
+def load_tag_map() -> dict:
+    """Slug to id map of all tags with the TAGS version it was read at.
+
+    The version is read first, a tag saved in between leaves the map
+    newer than its version, never older."""
+    tag_map = {
+        "version": get_version(TAGS),
+        "ids": dict(Tag.objects.values_list("slug", "pk")),
+    }
+    caches["default"].set(
+        CACHE_KEY, tag_map, timeout=settings.TAG_MAP_CACHE_TIMEOUT
+    )
+    return tag_map
+
+
+def get_tag_ids(slugs: Iterable[str]) -> Dict[str, int]:
+    """Ids of the tags with the slugs, unknown slugs are left out.
+
+    The map of all tags is cached until a tag is saved or deleted. An
+    unknown slug reloads it only when the TAGS version moved, a tag
+    saved by another process is found before the cache of this one
+    expires, and unknown slugs sent again and again cost a version
+    lookup each, not a reload."""
+    slugs = set(slugs)
+    tag_map = caches["default"].get(CACHE_KEY)
+    if tag_map is None or (
+        not slugs.issubset(tag_map["ids"])
+        and tag_map["version"] != get_version(TAGS)
+    ):
+        tag_map = load_tag_map()
+    ids = tag_map["ids"]
+    return {slug: ids[slug] for slug in slugs if slug in ids}
+
+
+def forget_tag_map():
+    """Drop the cached map, at once and after the commit."""
+    caches["default"].delete(CACHE_KEY)
+    transaction.on_commit(lambda: caches["default"].delete(CACHE_KEY))
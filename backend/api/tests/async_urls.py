@@ -0,0 +1,13 @@
+from django.urls import include, path
+
+from api import urls as api_urls
+from api.async_views import async_read_urls
+
+# the urls of SERVER_MODE=asgi, whatever the mode of the test run is
+urlpatterns = [
+    path(
+        "api/",
+        include((async_read_urls(api_urls.urlpatterns), api_urls.app_name)),
+    ),
+    path("api/", include("users.urls")),
+]
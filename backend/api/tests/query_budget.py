@@ -0,0 +1,23 @@
+from api.middleware import QueryRecorder
+
+
+class QueryBudgetMixin:
+    """Assertions on the number of queries made by a request.
+
+    Unlike assertNumQueries a budget is an upper bound, so endpoints may
+    get cheaper without touching the tests. Checked at several data
+    sizes it catches queries made per row of a page."""
+
+    def assertQueryBudget(self, budget: int, client, url: str, **kwargs):
+        with QueryRecorder().record() as recorder:
+            response = client.get(url, **kwargs)
+        if recorder.count > budget:
+            queries = "\n".join(
+                f"{number}. {sql}"
+                for number, sql in enumerate(recorder.queries, start=1)
+            )
+            self.fail(
+                f"{url}: {recorder.count} queries over the budget of "
+                f"{budget}, repeated {recorder.duplicates}\n{queries}"
+            )
+        return response
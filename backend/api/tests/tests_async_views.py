@@ -0,0 +1,147 @@
+import asyncio
+import shutil
+import threading
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from api import urls as api_urls
+from api.async_views import HOT_READS, async_read_urls
+from api.models import Subscription
+from api.response_cache import CACHE_ALIAS
+from api.tests.factories import RecipeFactory, TagFactory
+from api.views import RecipeViewSet, TagViewSet
+from backend.asgi import application
+from users.tests.factories import CustomUserFactory
+
+MEDIA_PATH = "./test_media/"
+
+
+class AsyncReadUrlsTests(TestCase):
+    def test_hot_reads_only(self):
+        for pattern in async_read_urls(api_urls.urlpatterns):
+            with self.subTest(name=pattern.name):
+                self.assertEqual(
+                    asyncio.iscoroutinefunction(pattern.callback),
+                    pattern.name in HOT_READS,
+                )
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_PATH, ROOT_URLCONF="api.tests.async_urls"
+)
+class AsyncReadViewsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.user = CustomUserFactory.create()
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = RecipeFactory.create(tags=TagFactory.create_batch(2))
+        Subscription.objects.create(
+            follower=self.user, leader=self.recipe.author
+        )
+        self.urls = (
+            reverse("api:recipes-list"),
+            reverse("api:recipes-detail", args=[self.recipe.pk]),
+            reverse("api:tags-list"),
+            reverse("api:ingredients-list"),
+            reverse("api:subscriptions-list"),
+        )
+        # AsyncClient takes the names of the headers, not of the META keys
+        self.headers = {"authorization": f"Token {self.token.key}"}
+        self.sync_client = APIClient()
+        self.sync_client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        # the responses of the sync views, as WSGI serves them
+        self.expected = [
+            self.sync_client.get(url).json() for url in self.urls
+        ]
+
+    async def test_same_responses(self):
+        client = AsyncClient()
+        for url, expected in zip(self.urls, self.expected):
+            with self.subTest(url=url):
+                response = await client.get(url, **self.headers)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.json(), expected)
+
+    async def test_cached_without_view(self):
+        client = AsyncClient()
+        url = self.urls[0]
+        response = await client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        with mock.patch.object(
+            RecipeViewSet, "dispatch", side_effect=AssertionError
+        ):
+            response = await client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    async def test_writes(self):
+        response = await AsyncClient().post(
+            reverse("api:recipes-list"),
+            data={},
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(ROOT_URLCONF="api.tests.async_urls")
+class RequestThreadTests(SimpleTestCase):
+    """Requests through the ASGI application, not the test client."""
+
+    async def get(self, path: str) -> int:
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [(b"host", b"testserver")],
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        await application(scope, receive, send)
+        return messages[0]["status"]
+
+    def test_slow_reads_overlap(self):
+        # each read waits until the other one runs, so they time out
+        # unless they run in two threads at once
+        barrier = threading.Barrier(2, timeout=5)
+        threads = set()
+
+        def slow_list(viewset, request, *args, **kwargs):
+            threads.add(threading.get_ident())
+            barrier.wait()
+            return Response([])
+
+        async def get_both():
+            return await asyncio.gather(
+                self.get("/api/tags/"), self.get("/api/tags/")
+            )
+
+        # run from a sync test, as a server runs the application: in an
+        # async test the thread sensitive code goes to the test thread
+        with mock.patch.object(TagViewSet, "list", slow_list):
+            statuses = asyncio.run(get_both())
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 2)
+        self.assertEqual(len(threads), 2)
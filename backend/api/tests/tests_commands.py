@@ -0,0 +1,214 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F
+from django.test import TestCase
+from django.test.utils import override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import (
+    AmountIngredient,
+    Ingredient,
+    MeasurementUnit,
+    Recipe,
+    Subscription,
+    Tag,
+)
+from api.tests.factories import IngredientFactory, RecipeFactory
+from users.models import CustomUser
+from users.tests.factories import CustomUserFactory
+from utils.fill_db import iter_json_array
+from utils.generate_dataset import PUBLISHED_UNTIL
+
+MEDIA_PATH = "./test_media/"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class ReconcileCountersTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def test_reconcile(self):
+        author = CustomUserFactory.create()
+        users = CustomUserFactory.create_batch(3)
+        recipe = RecipeFactory.create(
+            author=author, users_chose_as_favorite=users
+        )
+        recipe.users_put_in_cart.add(users[0])
+        Subscription.objects.create(follower=users[0], leader=author)
+        Recipe.objects.update(favorites_count=42, shopping_cart_count=0)
+        CustomUser.objects.update(recipes_count=7, followers_count=0)
+
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+
+        recipe.refresh_from_db()
+        author.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 3)
+        self.assertEqual(recipe.shopping_cart_count, 1)
+        self.assertEqual(author.recipes_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertIn("favorites_count: 1 fixed", out.getvalue())
+
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertNotIn(" 1 fixed", out.getvalue())
+
+
+class LoadIngredientsTests(TestCase):
+    def setUp(self):
+        self.catalog = [
+            {"name": "абрикос", "measurement_unit": "г"},
+            {"name": "банан", "measurement_unit": "шт."},
+            {"name": "вода", "measurement_unit": "мл"},
+            {"name": "вода", "measurement_unit": "мл"},
+        ]
+        json_file = tempfile.NamedTemporaryFile(
+            "w", suffix=".json", delete=False, encoding="utf-8"
+        )
+        with json_file:
+            json.dump(self.catalog, json_file, ensure_ascii=False)
+        self.path = json_file.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_load(self):
+        MeasurementUnit.objects.create(name="г")
+        out = StringIO()
+        call_command("load_ingredients", self.path, stdout=out)
+
+        self.assertEqual(MeasurementUnit.objects.count(), 3)
+        self.assertEqual(
+            set(
+                Ingredient.objects.values_list(
+                    "name", "measurement_unit__name"
+                )
+            ),
+            {("абрикос", "г"), ("банан", "шт."), ("вода", "мл")},
+        )
+        self.assertIn(
+            "measurement units: 2 inserted, 1 skipped", out.getvalue()
+        )
+        self.assertIn("ingredients: 3 inserted, 1 skipped", out.getvalue())
+
+    def test_reload(self):
+        call_command("load_ingredients", self.path, stdout=StringIO())
+        out = StringIO()
+        with self.assertNumQueries(10):
+            call_command(
+                "load_ingredients", self.path, batch_size=2, stdout=out
+            )
+        self.assertEqual(Ingredient.objects.count(), 3)
+        self.assertIn(
+            "measurement units: 0 inserted, 3 skipped", out.getvalue()
+        )
+        self.assertIn("ingredients: 0 inserted, 4 skipped", out.getvalue())
+
+    def test_iter_json_array(self):
+        with open(self.path, encoding="utf-8") as json_file:
+            items = list(iter_json_array(json_file, chunk_size=7))
+        self.assertEqual(items, self.catalog)
+
+        for text in ('[1, 22, "a]", {"b": [3]}]', "  [ ]"):
+            with self.subTest(text=text):
+                with tempfile.TemporaryFile("w+") as json_file:
+                    json_file.write(text)
+                    json_file.seek(0)
+                    items = list(iter_json_array(json_file, chunk_size=2))
+                self.assertEqual(items, json.loads(text))
+
+    def test_invalid_json(self):
+        for text in ('{"name": "вода"}', "[1, 2"):
+            with self.subTest(text=text):
+                with tempfile.TemporaryFile("w+") as json_file:
+                    json_file.write(text)
+                    json_file.seek(0)
+                    with self.assertRaises(ValueError):
+                        list(iter_json_array(json_file, chunk_size=2))
+
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, **options):
+        out = StringIO()
+        options = {
+            "recipes": 200,
+            "users": 20,
+            "favorites_per_user": 30,
+            "cart_per_user": 5,
+            "subscriptions_per_user": 3,
+            "tags": 5,
+            "batch_size": 64,
+            "days": 10,
+            **options,
+        }
+        call_command("generate_dataset", stdout=out, **options)
+        return out.getvalue()
+
+    def test_generate(self):
+        IngredientFactory.create_batch(30)
+        output = self.generate()
+
+        self.assertEqual(Recipe.objects.count(), 200)
+        self.assertEqual(CustomUser.objects.count(), 20)
+        self.assertEqual(Tag.objects.count(), 5)
+        # no column depends on the time of the run
+        self.assertEqual(
+            set(CustomUser.objects.values_list("password", "date_joined")),
+            {("!generated-1", PUBLISHED_UNTIL - datetime.timedelta(days=10))},
+        )
+        self.assertFalse(CustomUser.objects.first().has_usable_password())
+        self.assertFalse(
+            AmountIngredient.objects.values("recipe")
+            .annotate(number=Count("*"))
+            .filter(number=0)
+            .exists()
+        )
+        self.assertFalse(
+            Subscription.objects.filter(follower=F("leader")).exists()
+        )
+        favorites = Recipe.users_chose_as_favorite.through.objects.count()
+        self.assertIn(f"favorites: {favorites}", output)
+        # the counters are reconciled, the rows bypass the signals
+        self.assertEqual(
+            sum(Recipe.objects.values_list("favorites_count", flat=True)),
+            favorites,
+        )
+        self.assertEqual(
+            sum(CustomUser.objects.values_list("recipes_count", flat=True)),
+            200,
+        )
+        # popular recipes collect a share of the favorites
+        most_favorited = Recipe.objects.order_by("-favorites_count").first()
+        self.assertGreater(
+            most_favorited.favorites_count, 3 * favorites / 200
+        )
+
+        self.generate(seed=2)
+        self.assertEqual(Recipe.objects.count(), 400)
+        self.assertEqual(Tag.objects.count(), 5)
+
+    def test_feed_validators_change(self):
+        IngredientFactory.create_batch(30)
+        self.generate(recipes=50)
+        client = APIClient()
+        response = client.get("/api/recipes/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        # the same seed, the new recipes are not newer than the old ones
+        self.generate(recipes=50)
+        response = client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_no_ingredients(self):
+        with self.assertRaises(CommandError):
+            self.generate()
+        self.assertFalse(Recipe.objects.exists())
@@ -0,0 +1,111 @@
+import shutil
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Recipe
+from api.tests.factories import IngredientFactory, RecipeFactory, TagFactory
+from users.tests.factories import CustomUserFactory
+
+MEDIA_PATH = "./test_media/"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def setUp(self):
+        self.user = CustomUserFactory.create()
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(user=self.user)
+        self.recipe = RecipeFactory.create(tags=TagFactory.create_batch(2))
+
+    def get_etag(self, client, url: str) -> str:
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Authorization", response["Vary"])
+        return response["ETag"]
+
+    def assertNotModified(self, client, url: str, etag: str):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(response.content)
+
+    def test_not_modified(self):
+        urls = (
+            reverse("api:recipes-list"),
+            reverse("api:recipes-detail", args=[self.recipe.pk]),
+            reverse("api:tags-list"),
+            reverse("api:ingredients-list"),
+        )
+        for url in urls:
+            for client in (self.user_client, APIClient()):
+                with self.subTest(url=url, client=client):
+                    etag = self.get_etag(client, url)
+                    self.assertNotModified(client, url, etag)
+
+    def test_not_modified_skips_page(self):
+        url = reverse("api:recipes-list")
+        etag = self.get_etag(self.user_client, url)
+        # versions and the recipes state of the user only
+        with self.assertNumQueries(2):
+            self.assertNotModified(self.user_client, url, etag)
+
+    def test_favorite_changes_etag(self):
+        url = reverse("api:recipes-list")
+        etag = self.get_etag(self.user_client, url)
+        anonymous_etag = self.get_etag(APIClient(), url)
+
+        self.user_client.get(
+            reverse("api:recipes-favorite", args=[self.recipe.pk])
+        )
+
+        self.assertNotEqual(self.get_etag(self.user_client, url), etag)
+        self.assertEqual(self.get_etag(APIClient(), url), anonymous_etag)
+
+    def test_recipe_changes_etag(self):
+        list_url = reverse("api:recipes-list")
+        detail_url = reverse("api:recipes-detail", args=[self.recipe.pk])
+        changes = (
+            (
+                lambda: Recipe.objects.get(pk=self.recipe.pk).save(),
+                (list_url, detail_url),
+            ),
+            (
+                lambda: self.recipe.tags.first().save(),
+                (list_url, detail_url),
+            ),
+            # a deleted recipe is a 404 of its own detail page
+            (lambda: RecipeFactory.create().delete(), (list_url,)),
+        )
+        for change, urls in changes:
+            etags = [self.get_etag(APIClient(), url) for url in urls]
+            change()
+            for url, etag in zip(urls, etags):
+                with self.subTest(url=url):
+                    self.assertNotEqual(self.get_etag(APIClient(), url), etag)
+
+    @override_settings(INGREDIENT_INDEX_CHECK_INTERVAL=0)
+    def test_catalog_changes_etag(self):
+        url = reverse("api:ingredients-list")
+        etag = self.get_etag(APIClient(), url)
+        IngredientFactory.create()
+        self.assertNotEqual(self.get_etag(APIClient(), url), etag)
+
+    def test_last_modified_anonymous_only(self):
+        url = reverse("api:recipes-list")
+        response = APIClient().get(url)
+        last_modified = response["Last-Modified"]
+
+        response = APIClient().get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.user_client.get(url)
+        self.assertFalse(response.has_header("Last-Modified"))
@@ -0,0 +1,227 @@
+import base64
+import shutil
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+
+from api.constants import IMAGE_VARIANTS
+from api.fields import BASE64_CHUNK_SIZE, RecipeImageField
+from api.images import process_pending_images, render_variants
+from api.models import ImageStatus, Recipe
+from api.tests.factories import IngredientFactory, TagFactory
+from users.tests.factories import CustomUserFactory
+
+MEDIA_PATH = "./test_media/"
+
+
+def make_image(size=(2000, 1000), image_format="JPEG", noise=False) -> bytes:
+    if noise:
+        image = Image.effect_noise(size, 100).convert("RGB")
+    else:
+        image = Image.new("RGB", size, "orange")
+    content = BytesIO()
+    image.save(content, image_format)
+    return content.getvalue()
+
+
+def make_image_base64(size=(2000, 1000), image_format="JPEG") -> str:
+    encoded = base64.b64encode(make_image(size, image_format)).decode()
+    return f"data:image/{image_format.lower()};base64,{encoded}"
+
+
+class RecipeImageFieldTests(TestCase):
+    def test_decoded_in_chunks(self):
+        content = make_image((600, 600), "PNG", noise=True)
+        encoded = base64.b64encode(content).decode()
+        self.assertGreater(len(encoded), 3 * BASE64_CHUNK_SIZE)
+
+        upload = RecipeImageField().to_internal_value(
+            f"data:image/png;base64,{encoded}"
+        )
+
+        self.assertTrue(upload.name.endswith(".png"))
+        self.assertEqual(upload.size, len(content))
+        self.assertEqual(b"".join(upload.chunks()), content)
+
+    def test_line_breaks(self):
+        content = make_image((100, 100))
+        encoded = base64.encodebytes(content).decode()
+        self.assertIn("\n", encoded)
+
+        upload = RecipeImageField().to_internal_value(encoded)
+
+        self.assertTrue(upload.name.endswith(".jpg"))
+        self.assertEqual(b"".join(upload.chunks()), content)
+
+    def test_invalid_base64(self):
+        for payload in ("data:image/png;base64,iVBO!!!!", "abc", 42):
+            with self.subTest(payload=payload):
+                with self.assertRaises(serializers.ValidationError):
+                    RecipeImageField().to_internal_value(payload)
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=1000)
+    def test_too_large(self):
+        encoded = make_image_base64((1000, 1000), "PNG")
+        with mock.patch("base64.b64decode") as b64decode:
+            with self.assertRaisesMessage(
+                serializers.ValidationError, "1000 bytes"
+            ):
+                RecipeImageField().to_internal_value(encoded)
+        b64decode.assert_not_called()
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels(self):
+        field = RecipeImageField()
+        field.to_internal_value(make_image_base64((100, 100)))
+
+        content = make_image((400, 400), "PNG", noise=True)
+        encoded = base64.b64encode(content).decode()
+        self.assertGreater(len(encoded), 3 * BASE64_CHUNK_SIZE)
+        with mock.patch("base64.b64decode", wraps=base64.b64decode) as decode:
+            with self.assertRaisesMessage(
+                serializers.ValidationError, "10000 pixels"
+            ):
+                field.to_internal_value(encoded)
+        self.assertEqual(decode.call_count, 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class RecipeImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = CustomUserFactory.create()
+        cls.author_client = APIClient()
+        cls.author_client.force_authenticate(user=cls.author)
+        cls.tag = TagFactory.create()
+        cls.ingredient = IngredientFactory.create()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def create_recipe(self, image: str):
+        return RecipeImageTests.author_client.post(
+            reverse("api:recipes-list"),
+            data={
+                "name": "рецепт",
+                "text": "описание",
+                "cooking_time": 10,
+                "tags": [RecipeImageTests.tag.id],
+                "ingredients": [
+                    {"id": RecipeImageTests.ingredient.id, "amount": 1}
+                ],
+                "image": image,
+            },
+            format="json",
+        )
+
+    def test_upload_stored_as_is(self):
+        response = self.create_recipe(make_image_base64())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        self.assertEqual(recipe.image_status, ImageStatus.PENDING)
+        self.assertTrue(response.data["image"].endswith(recipe.image.url))
+
+    def test_variants(self):
+        response = self.create_recipe(make_image_base64(image_format="PNG"))
+
+        processed = process_pending_images()
+
+        self.assertEqual(processed, {ImageStatus.READY: 1})
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        self.assertEqual(recipe.image_status, ImageStatus.READY)
+        for variant, size in IMAGE_VARIANTS.items():
+            for extension in ("webp", "jpeg"):
+                path = recipe.image_variants[variant][extension]
+                with default_storage.open(path) as variant_file:
+                    image = Image.open(variant_file)
+                    self.assertEqual(image.format.lower(), extension)
+                    self.assertEqual(image.size, (size[0], size[1] // 2))
+
+    def test_list_points_at_card(self):
+        response = self.create_recipe(make_image_base64())
+        process_pending_images()
+        recipe = Recipe.objects.get(pk=response.data["id"])
+
+        response = RecipeImageTests.author_client.get(
+            reverse("api:recipes-list")
+        )
+        card = recipe.image_variants["card"]["jpeg"]
+        self.assertTrue(response.data["results"][0]["image"].endswith(card))
+
+        response = RecipeImageTests.author_client.get(
+            reverse("api:recipes-detail", args=[recipe.pk])
+        )
+        detail = recipe.image_variants["detail"]["jpeg"]
+        self.assertTrue(response.data["image"].endswith(detail))
+
+    def test_replaced_image(self):
+        response = self.create_recipe(make_image_base64())
+        process_pending_images()
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        old_variants = recipe.image_variants
+
+        response = RecipeImageTests.author_client.patch(
+            reverse("api:recipes-detail", args=[recipe.pk]),
+            data={"image": make_image_base64((300, 300))},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, ImageStatus.PENDING)
+        self.assertTrue(response.data["image"].endswith(recipe.image.url))
+
+        process_pending_images()
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.image_variants, old_variants)
+        self.assertFalse(
+            default_storage.exists(old_variants["card"]["jpeg"])
+        )
+
+    def test_image_replaced_while_processing(self):
+        response = self.create_recipe(make_image_base64())
+        recipe = Recipe.objects.get(pk=response.data["id"])
+
+        def render_and_replace(image_file):
+            rendered = render_variants(image_file)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                image="recipes/other.png"
+            )
+            return rendered
+
+        with mock.patch(
+            "api.images.render_variants", side_effect=render_and_replace
+        ):
+            process_pending_images()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, ImageStatus.PENDING)
+        self.assertEqual(recipe.image_variants, {})
+
+    def test_broken_image(self):
+        broken = base64.b64encode(b"\xff\xd8\xff" + b"0" * 100).decode()
+        response = self.create_recipe(f"data:image/jpeg;base64,{broken}")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        processed = process_pending_images()
+
+        self.assertEqual(processed, {ImageStatus.FAILED: 1})
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        response = RecipeImageTests.author_client.get(
+            reverse("api:recipes-detail", args=[recipe.pk])
+        )
+        self.assertTrue(response.data["image"].endswith(recipe.image.url))
+
+    def test_not_an_image(self):
+        text = base64.b64encode(b"not an image").decode()
+        response = self.create_recipe(f"data:image/png;base64,{text}")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,247 @@
+import shutil
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.middleware import QueryRecorder, fingerprint
+from api.models import Ingredient, Subscription
+from api.serializers import RecipeCreateUpdateSerializer
+from api.tests.factories import (
+    AmountIngredientFactory,
+    IngredientFactory,
+    RecipeFactory,
+    TagFactory,
+)
+from api.tests.query_budget import QueryBudgetMixin
+from users.tests.factories import CustomUserFactory
+
+MEDIA_PATH = "./test_media/"
+
+
+class QueryInstrumentationTests(TestCase):
+    @override_settings(QUERY_INSTRUMENTATION=True)
+    def test_headers(self):
+        TagFactory.create_batch(2)
+        response = APIClient().get(reverse("api:tags-list"))
+        self.assertEqual(response["X-Query-Count"], "2")
+        self.assertGreaterEqual(float(response["X-Query-Time"]), 0)
+        self.assertEqual(response["X-Query-Duplicates"], "")
+
+    @override_settings(QUERY_INSTRUMENTATION=False)
+    def test_disabled(self):
+        response = APIClient().get(reverse("api:tags-list"))
+        self.assertFalse(response.has_header("X-Query-Count"))
+
+    def test_duplicates(self):
+        ingredients = IngredientFactory.create_batch(3)
+        with QueryRecorder().record() as recorder:
+            for ingredient in ingredients:
+                Ingredient.objects.get(pk=ingredient.pk)
+            list(Ingredient.objects.all())
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(len(recorder.duplicates), 1)
+        self.assertEqual(list(recorder.duplicates.values()), [3])
+
+    def test_fingerprint_ignores_in_list_length(self):
+        self.assertEqual(
+            fingerprint('SELECT 1 WHERE "id" IN (%s)'),
+            fingerprint('SELECT 1 WHERE "id" IN (%s, %s, %s)'),
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class RecipeValidationQueryTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def setUp(self):
+        self.recipe = RecipeFactory.create()
+
+    def validate(self, ingredients, tags) -> RecipeCreateUpdateSerializer:
+        serializer = RecipeCreateUpdateSerializer(
+            instance=self.recipe,
+            data={
+                "ingredients": [
+                    {"id": ingredient, "amount": 1}
+                    for ingredient in ingredients
+                ],
+                "tags": tags,
+            },
+            partial=True,
+        )
+        serializer.is_valid()
+        return serializer
+
+    def test_same_queries_at_every_size(self):
+        tags = [tag.pk for tag in TagFactory.create_batch(5)]
+        for size in (1, 30):
+            ingredients = [
+                ingredient.pk
+                for ingredient in IngredientFactory.create_batch(size)
+            ]
+            with self.subTest(size=size):
+                # one IN query for the ingredients and one for the tags
+                with self.assertNumQueries(2):
+                    serializer = self.validate(ingredients, tags)
+                self.assertFalse(serializer.errors)
+
+    def test_every_missing_id_reported(self):
+        ingredient = IngredientFactory.create().pk
+        tag = TagFactory.create().pk
+        with self.assertNumQueries(2):
+            serializer = self.validate(
+                [ingredient, 1000, "2000"], [tag, 1000, "wrong", 2000]
+            )
+        ingredients_errors = serializer.errors["ingredients"]
+        self.assertEqual(ingredients_errors[0], {})
+        for number in (1, 2):
+            self.assertEqual(
+                ingredients_errors[number]["id"][0].code, "does_not_exist"
+            )
+        self.assertEqual(
+            [error.code for error in serializer.errors["tags"]],
+            ["does_not_exist", "incorrect_type", "does_not_exist"],
+        )
+
+    def test_duplicate_ids(self):
+        ingredient = IngredientFactory.create().pk
+        tag = TagFactory.create().pk
+        serializer = self.validate([ingredient, ingredient], [tag, tag])
+        self.assertIn("ingredients", serializer.errors)
+        self.assertIn("tags", serializer.errors)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Budgets of the read endpoints, the same at every data size."""
+
+    DATA_SIZES = (1, 5, 20)
+    BUDGETS = {
+        "recipes-list": 7,
+        # and the generation tokens of the response cache
+        "recipes-list-anonymous": 8,
+        "recipes-detail": 6,
+        "subscriptions-list": 3,
+        "users-list": 2,
+        "users-detail": 1,
+        "ingredients-list": 1,
+        "ingredients-search": 0,
+        "tags-list": 2,
+        "shopping-cart-download": 2,
+    }
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def setUp(self):
+        caches["default"].clear()
+        self.user = CustomUserFactory.create()
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(user=self.user)
+        self.recipe = RecipeFactory.create()
+        self.recipes = [self.recipe]
+
+    def grow_to(self, size: int):
+        """Add rows until every collection has the given size."""
+        for _ in range(len(self.recipes), size):
+            author = CustomUserFactory.create()
+            Subscription.objects.create(follower=self.user, leader=author)
+            recipe = RecipeFactory.create(
+                author=author,
+                tags=TagFactory.create_batch(2),
+                users_chose_as_favorite=[self.user],
+            )
+            recipe.users_put_in_cart.add(self.user)
+            AmountIngredientFactory.create(
+                recipe=recipe, ingredient=IngredientFactory.create()
+            )
+            self.recipe.tags.add(TagFactory.create())
+            AmountIngredientFactory.create(
+                recipe=self.recipe, ingredient=IngredientFactory.create()
+            )
+            self.recipes.append(recipe)
+
+    def check_budget(self, name: str, client, url: str, params=None):
+        for size in self.DATA_SIZES:
+            self.grow_to(size)
+            caches["shopping_lists"].clear()
+            self.user.refresh_from_db()
+            with self.subTest(size=size):
+                self.assertQueryBudget(
+                    self.BUDGETS[name],
+                    client,
+                    url,
+                    data={"limit": size, **(params or {})},
+                )
+
+    def test_recipes_list(self):
+        self.check_budget(
+            "recipes-list", self.user_client, reverse("api:recipes-list")
+        )
+
+    def test_recipes_list_anonymous(self):
+        self.check_budget(
+            "recipes-list-anonymous", APIClient(), reverse("api:recipes-list")
+        )
+
+    def test_recipes_detail(self):
+        self.check_budget(
+            "recipes-detail",
+            self.user_client,
+            reverse("api:recipes-detail", args=[self.recipe.pk]),
+        )
+
+    def test_subscriptions_list(self):
+        self.check_budget(
+            "subscriptions-list",
+            self.user_client,
+            reverse("api:subscriptions-list"),
+        )
+
+    def test_users_list(self):
+        self.check_budget(
+            "users-list", self.user_client, reverse("users:user-list")
+        )
+
+    def test_users_detail(self):
+        self.check_budget(
+            "users-detail",
+            self.user_client,
+            reverse("users:user-detail", args=[self.recipe.author.pk]),
+        )
+
+    @override_settings(INGREDIENT_INDEX_CHECK_INTERVAL=60)
+    def test_ingredients_list(self):
+        url = reverse("api:ingredients-list")
+        # the validators come from the in-process index as well
+        self.user_client.get(url)
+        self.check_budget("ingredients-list", self.user_client, url)
+
+    @override_settings(INGREDIENT_INDEX_CHECK_INTERVAL=60)
+    def test_ingredients_search(self):
+        url = reverse("api:ingredients-list")
+        params = {"name": "ингр"}
+        # the first request builds the in-process index
+        self.user_client.get(url, data=params)
+        self.check_budget(
+            "ingredients-search", self.user_client, url, params=params
+        )
+
+    def test_tags_list(self):
+        self.check_budget(
+            "tags-list", self.user_client, reverse("api:tags-list")
+        )
+
+    def test_shopping_cart_download(self):
+        self.check_budget(
+            "shopping-cart-download",
+            self.user_client,
+            reverse("api:recipes-download_shopping_cart"),
+        )
@@ -0,0 +1,148 @@
+import shutil
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Recipe
+from api.response_cache import CACHE_ALIAS, bump_recipes, get_stats
+from api.tests.factories import RecipeFactory, TagFactory
+from users.tests.factories import CustomUserFactory
+
+MEDIA_PATH = "./test_media/"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.anonymous_client = APIClient()
+        self.tags = TagFactory.create_batch(2)
+        self.recipe = RecipeFactory.create(tags=self.tags)
+        self.other_recipe = RecipeFactory.create(tags=self.tags)
+        self.list_url = reverse("api:recipes-list")
+        self.detail_url = reverse(
+            "api:recipes-detail", args=[self.recipe.pk]
+        )
+        self.other_detail_url = reverse(
+            "api:recipes-detail", args=[self.other_recipe.pk]
+        )
+
+    def assertCache(self, state: str, url: str, **kwargs):
+        response = self.anonymous_client.get(url, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Cache"], state)
+        return response
+
+    def test_hit(self):
+        for url in (self.list_url, self.detail_url):
+            with self.subTest(url=url):
+                missed = self.assertCache("MISS", url)
+                # the generation tokens
+                with self.assertNumQueries(1):
+                    hit = self.assertCache("HIT", url)
+                self.assertEqual(hit.content, missed.content)
+                self.assertEqual(hit["ETag"], missed["ETag"])
+                self.assertEqual(hit["Content-Type"], missed["Content-Type"])
+
+    def test_hit_not_modified(self):
+        etag = self.assertCache("MISS", self.list_url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.anonymous_client.get(
+                self.list_url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_normalized_query(self):
+        first, second = (tag.slug for tag in self.tags)
+        self.assertCache(
+            "MISS", f"{self.list_url}?tags={first}&tags={second}&limit=1"
+        )
+        self.assertCache(
+            "HIT", f"{self.list_url}?limit=1&tags={second}&tags={first}"
+        )
+        self.assertCache("MISS", f"{self.list_url}?limit=1&tags={first}")
+
+    def test_authenticated_not_cached(self):
+        client = APIClient()
+        client.force_authenticate(user=CustomUserFactory.create())
+        self.assertCache("MISS", self.list_url)
+        response = client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header("X-Cache"))
+
+    def test_recipe_change(self):
+        for url in (self.list_url, self.detail_url, self.other_detail_url):
+            self.assertCache("MISS", url)
+
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.name = "новое название"
+        recipe.save()
+
+        response = self.assertCache("MISS", self.detail_url)
+        self.assertEqual(response.data["name"], "новое название")
+        self.assertCache("MISS", self.list_url)
+        self.assertCache("HIT", self.other_detail_url)
+
+    def test_recipe_tags_change(self):
+        self.assertCache("MISS", self.detail_url)
+        self.recipe.tags.remove(self.tags[0])
+        response = self.assertCache("MISS", self.detail_url)
+        self.assertEqual(len(response.data["tags"]), 1)
+
+    def test_tag_change(self):
+        for url in (self.list_url, self.detail_url):
+            self.assertCache("MISS", url)
+
+        self.tags[0].name = "новый тег"
+        self.tags[0].save()
+
+        for url in (self.list_url, self.detail_url):
+            with self.subTest(url=url):
+                self.assertCache("MISS", url)
+
+    def test_rolled_back_change(self):
+        self.assertCache("MISS", self.detail_url)
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                self.recipe.save()
+                raise DatabaseError
+        self.assertCache("HIT", self.detail_url)
+
+    def test_bump_from_other_process(self):
+        self.assertCache("MISS", self.detail_url)
+        self.assertCache("HIT", self.detail_url)
+        # the image worker, with a cache of its own
+        worker_caches = {
+            **settings.CACHES,
+            CACHE_ALIAS: {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "worker-responses",
+            },
+        }
+        with override_settings(CACHES=worker_caches):
+            bump_recipes(self.recipe.pk)
+        self.assertCache("MISS", self.detail_url)
+
+    def test_stats(self):
+        self.assertCache("MISS", self.list_url)
+        self.assertCache("HIT", self.list_url)
+        self.assertCache("HIT", self.list_url)
+        self.assertEqual(get_stats(), {"hits": 2, "misses": 1})
+
+        out = StringIO()
+        call_command("response_cache_stats", "--reset", stdout=out)
+        self.assertIn("hits: 2, misses: 1, hit ratio: 66.7%", out.getvalue())
+        self.assertEqual(get_stats(), {"hits": 0, "misses": 0})
@@ -0,0 +1,170 @@
+import datetime
+import shutil
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+from django.test.utils import override_settings
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.constants import IMAGE_CARD
+from api.models import ImageStatus, Ingredient, Recipe, Subscription, Tag
+from api.renderers import FastJSONRenderer
+from api.serializers import (
+    CompiledIngredientSerializer,
+    CompiledRecipeSerializer,
+    CompiledTagSerializer,
+    IngredientSerializer,
+    RecipeSerializer,
+    TagSerializer,
+)
+from api.tests.factories import (
+    AmountIngredientFactory,
+    IngredientFactory,
+    RecipeFactory,
+    TagFactory,
+)
+from users.tests.factories import CustomUserFactory
+
+MEDIA_PATH = "./test_media/"
+# the line separators are escaped by both renderers
+TRICKY_TEXT = 'Кавычки " и \\, перевод\nстроки, 🍲, \u2028 и \u2029.'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class CompiledSerializersTests(TestCase):
+    """The compiled serializers and the fast renderer against DRF."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUserFactory.create()
+        tags = [
+            TagFactory.create(),
+            TagFactory.create(name=TRICKY_TEXT, slug="tricky", color=None),
+        ]
+        ingredients = IngredientFactory.create_batch(3)
+        author = CustomUserFactory.create(first_name=TRICKY_TEXT)
+        Subscription.objects.create(follower=cls.user, leader=author)
+        processed = RecipeFactory.create(
+            author=author,
+            tags=tags,
+            text=TRICKY_TEXT,
+            users_chose_as_favorite=[cls.user],
+        )
+        processed.users_put_in_cart.add(cls.user)
+        Recipe.objects.filter(pk=processed.pk).update(
+            image_status=ImageStatus.READY,
+            image_variants={
+                variant: {
+                    "jpeg": f"recipes/variants/{variant}.jpeg",
+                    "webp": f"recipes/variants/{variant}.webp",
+                }
+                for variant in ("card", "detail")
+            },
+        )
+        pending = RecipeFactory.create(tags=tags[:1])
+        for amount, ingredient in zip((0.1, 2, 1234.5678), ingredients):
+            for recipe in (processed, pending):
+                AmountIngredientFactory.create(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+        RecipeFactory.create()
+
+    def get_context(self, user, **context) -> dict:
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        request.user = user
+        return {"request": request, **context}
+
+    def assertSameJSON(self, serializer, compiled, instance, **kwargs):
+        expected = JSONRenderer().render(serializer(instance, **kwargs).data)
+        rendered = FastJSONRenderer().render(compiled(instance, **kwargs).data)
+        self.assertEqual(rendered, expected)
+
+    def test_recipes(self):
+        for user in (AnonymousUser(), self.user):
+            recipes = list(Recipe.objects.for_read(user))
+            contexts = (
+                self.get_context(user, image_variant=IMAGE_CARD),
+                self.get_context(user),
+                {"request": None},
+            )
+            for context in contexts:
+                with self.subTest(user=user, context=context):
+                    self.assertSameJSON(
+                        RecipeSerializer,
+                        CompiledRecipeSerializer,
+                        recipes,
+                        many=True,
+                        context=context,
+                    )
+                    self.assertSameJSON(
+                        RecipeSerializer,
+                        CompiledRecipeSerializer,
+                        recipes[0],
+                        context=context,
+                    )
+
+    def test_recipes_not_annotated(self):
+        self.assertSameJSON(
+            RecipeSerializer,
+            CompiledRecipeSerializer,
+            Recipe.objects.all(),
+            many=True,
+            context=self.get_context(self.user),
+        )
+
+    def test_ingredients(self):
+        ingredients = Ingredient.objects.select_related("measurement_unit")
+        self.assertSameJSON(
+            IngredientSerializer,
+            CompiledIngredientSerializer,
+            ingredients,
+            many=True,
+        )
+
+    def test_tags(self):
+        self.assertSameJSON(
+            TagSerializer, CompiledTagSerializer, Tag.objects.all(), many=True
+        )
+
+    def test_renderer(self):
+        data = {
+            "text": TRICKY_TEXT,
+            "numbers": [1, -2, 0.5, 1234.5678, 2 ** 63 - 1],
+            "decimal": Decimal("1.10"),
+            "datetime": datetime.datetime(2021, 10, 1, 12, 30, 15, 123456),
+            "date": datetime.date(2021, 10, 1),
+            "time": datetime.time(12, 30, 15, 123456),
+            "error": ErrorDetail("Ошибка", code="invalid"),
+            1: None,
+        }
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with mock.patch("api.renderers.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+        # over 64 bits, left to JSONRenderer
+        data["big"] = 2 ** 70
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_renderer_indent(self):
+        data = {"name": TRICKY_TEXT, "tags": [1, 2]}
+        for media_type, context in (
+            ("application/json; indent=4", {}),
+            ("application/json", {"indent": 2}),
+        ):
+            with self.subTest(media_type=media_type, context=context):
+                self.assertEqual(
+                    FastJSONRenderer().render(data, media_type, context),
+                    JSONRenderer().render(data, media_type, context),
+                )
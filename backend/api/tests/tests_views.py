@@ -1,19 +1,27 @@
 import base64
 import json
 import shutil
-from collections import namedtuple
+import unittest
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from os.path import basename
 from typing import Dict, List
+from unittest import mock
 
+from django.core.cache import caches
 from django.core.files.images import ImageFile
-from django.test import TestCase
-from django.test.utils import override_settings
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from api.models import Ingredient, Recipe, Subscription, Tag
+from api.counters import increment
+from api.ingredient_index import clear_ingredient_index
+from api.models import AmountIngredient, Ingredient, Recipe, Subscription, Tag
 from api.serializers import RecipeMinifiedSerializer, UserWithRecipesSerializer
+from api.tag_map import CACHE_KEY
 from api.tests.factories import (
     AmountIngredientFactory,
     IngredientFactory,
@@ -21,6 +29,7 @@ from api.tests.factories import (
     RecipeFactory,
     TagFactory,
 )
+from api.views import RecipeViewSet
 from users.models import CustomUser
 from users.tests.factories import CustomUserFactory
 
@@ -50,6 +59,9 @@ URLS = {
     "recipes-detail": "api:recipes-detail",
     "recipes-favorite": "api:recipes-favorite",
     "recipes-shopping_cart": "api:recipes-shopping_cart",
+    "recipes-favorite-batch": "api:recipes-favorite-batch",
+    "recipes-shopping_cart-batch": "api:recipes-shopping_cart-batch",
+    "recipes-download_shopping_cart": "api:recipes-download_shopping_cart",
     "subscriptions-list": "api:subscriptions-list",
     "subscriptions-detail": "api:subscriptions-detail",
 }
@@ -112,6 +124,9 @@ class IngredientsTests(TestCase):
             cls.NUMBER_INGREDIENTS
         )
 
+    def setUp(self):
+        clear_ingredient_index()
+
     def test_get_list(self):
         response = IngredientsTests.client.get(
             reverse(URLS["ingredients-list"])
@@ -167,6 +182,89 @@ class IngredientsTests(TestCase):
             expected_result,
         )
 
+    @override_settings(INGREDIENT_INDEX_CHECK_INTERVAL=60)
+    def test_search_from_index(self):
+        ingredient = IngredientsTests.ingredients[0]
+        path = reverse(URLS["ingredients-list"])
+        IngredientsTests.client.get(path, {"name": ingredient.name})
+
+        with self.assertNumQueries(0):
+            response = IngredientsTests.client.get(
+                path, {"name": ingredient.name.upper()}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["id"] for item in response.data], [ingredient.id]
+        )
+
+    @override_settings(INGREDIENT_INDEX_CHECK_INTERVAL=0)
+    def test_index_rebuilt_on_catalog_change(self):
+        path = reverse(URLS["ingredients-list"])
+        response = IngredientsTests.client.get(path, {"name": "сахар"})
+        self.assertEqual(response.data, [])
+
+        measurement_unit = MeasurementUnitFactory.create(name="г")
+        sugar = IngredientFactory.create(
+            name="сахар", measurement_unit=measurement_unit
+        )
+        response = IngredientsTests.client.get(path, {"name": "сах"})
+        self.assertEqual(
+            response.data,
+            [{"id": sugar.id, "name": "сахар", "measurement_unit": "г"}],
+        )
+
+        measurement_unit.name = "кг"
+        measurement_unit.save()
+        response = IngredientsTests.client.get(path, {"name": "сах"})
+        self.assertEqual(response.data[0]["measurement_unit"], "кг")
+
+        sugar.delete()
+        response = IngredientsTests.client.get(path, {"name": "сах"})
+        self.assertEqual(response.data, [])
+
+    def test_fuzzy_search_ingredients(self):
+        measurement_unit = MeasurementUnitFactory.create()
+        names = (
+            "сок апельсиновый",
+            "апельсин",
+            "апельсиновая цедра",
+            "лимон",
+        )
+        ingredients = {
+            name: IngredientFactory.create(
+                name=name, measurement_unit=measurement_unit
+            )
+            for name in names
+        }
+
+        def search(**params) -> list:
+            response = IngredientsTests.client.get(
+                reverse(URLS["ingredients-list"]),
+                {"search": "fuzzy", **params},
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [ingredient["name"] for ingredient in response.data]
+
+        found = search(name="апельсин")
+        self.assertEqual(
+            found[:2],
+            ["апельсин", "апельсиновая цедра"],
+            msg="Совпадения по префиксу должны идти первыми",
+        )
+        self.assertIn(ingredients["сок апельсиновый"].name, found)
+        self.assertNotIn(ingredients["лимон"].name, found)
+
+        self.assertEqual(search(name="апелсин")[0], "апельсин")
+        self.assertEqual(search(name="цедра"), ["апельсиновая цедра"])
+        self.assertEqual(len(search(name="апельсин", limit=1)), 1)
+
+    def test_search_invalid_mode(self):
+        response = IngredientsTests.client.get(
+            reverse(URLS["ingredients-list"]),
+            {"name": "a", "search": "regex"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class TagsTests(TestCase):
     @classmethod
@@ -319,6 +417,59 @@ class RecipesTests(TestCase):
             expected_recipes,
         )
 
+    def test_list_number_queries(self):
+        numbers_queries = []
+        for limit in (1, Recipe.objects.count()):
+            with CaptureQueriesContext(connection) as queries:
+                response = RecipesTests.user_client.get(
+                    reverse(URLS["recipes-list"]), data={"limit": limit}
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["results"]), limit)
+            numbers_queries.append(len(queries))
+
+        self.assertEqual(
+            numbers_queries[0],
+            numbers_queries[1],
+            msg="Число запросов не должно зависеть от размера страницы",
+        )
+
+    def test_cursor_pagination(self):
+        path = reverse(URLS["recipes-list"])
+        expected_ids = list(
+            Recipe.objects.order_by("-pub_date", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        response = RecipesTests.user_client.get(
+            path, data={"pagination": "cursor", "limit": 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+
+        pages = [response.data]
+        while pages[-1]["next"]:
+            # validators, then recipes, tags, authors and ingredients,
+            # without COUNT
+            with self.assertNumQueries(6):
+                response = RecipesTests.user_client.get(pages[-1]["next"])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+
+        ids = [recipe["id"] for page in pages for recipe in page["results"]]
+        self.assertEqual(ids, expected_ids)
+
+        response = RecipesTests.user_client.get(pages[-1]["previous"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], pages[-2]["results"])
+
+    def test_invalid_cursor(self):
+        response = RecipesTests.user_client.get(
+            reverse(URLS["recipes-list"]), data={"cursor": "not-a-cursor"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_detail(self):
         recipe = Recipe.objects.latest("pub_date")
         response = RecipesTests.user_client.get(
@@ -334,6 +485,16 @@ class RecipesTests(TestCase):
             expected_recipes,
         )
 
+    def test_detail_not_numeric_pk(self):
+        for client in (APIClient(), RecipesTests.user_client):
+            with self.subTest(client=client):
+                response = client.get(
+                    reverse(URLS["recipes-detail"], args=["abc"])
+                )
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND
+                )
+
     def test_create(self):
         create_data = {
             "name": "Нечто восхитительное",
@@ -456,6 +617,112 @@ class RecipesTests(TestCase):
             recipe_dict_image_basename,
         )
 
+    def patch_recipe_writes(self, recipe, update_data: dict) -> Counter:
+        """Statements of the update that wrote ingredients or tags."""
+        with CaptureQueriesContext(connection) as queries:
+            response = RecipesTests.author_client.patch(
+                path=reverse(URLS["recipes-detail"], args=[recipe.id]),
+                data=json.dumps(update_data),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tables = (
+            AmountIngredient._meta.db_table,
+            Recipe.tags.through._meta.db_table,
+        )
+        writes = Counter()
+        for query in queries.captured_queries:
+            statement = query["sql"].split(" ", 1)[0]
+            for table in tables:
+                if statement in ("INSERT", "UPDATE", "DELETE") and (
+                    f'"{table}"' in query["sql"]
+                ):
+                    writes[(statement, table)] += 1
+        return writes
+
+    def test_update_writes_changed_ingredients_only(self):
+        recipe = RecipeFactory.create(author=RecipesTests.author)
+        kept, changed, removed = (
+            AmountIngredientFactory.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+            for ingredient in IngredientFactory.create_batch(3)
+        )
+        added = IngredientFactory.create()
+        update_data = {
+            "ingredients": [
+                {"id": kept.ingredient_id, "amount": 1},
+                {"id": changed.ingredient_id, "amount": 5},
+                {"id": added.id, "amount": 2},
+            ],
+        }
+
+        writes = self.patch_recipe_writes(recipe, update_data)
+
+        table = AmountIngredient._meta.db_table
+        self.assertEqual(
+            writes,
+            Counter(
+                {
+                    ("INSERT", table): 1,
+                    ("UPDATE", table): 1,
+                    ("DELETE", table): 1,
+                }
+            ),
+        )
+        amounts = {
+            amount.ingredient_id: (amount.pk, amount.amount)
+            for amount in recipe.amounts_ingredients.all()
+        }
+        self.assertEqual(amounts[kept.ingredient_id], (kept.pk, 1))
+        self.assertEqual(amounts[changed.ingredient_id], (changed.pk, 5))
+        self.assertEqual(amounts[added.id][1], 2)
+        self.assertNotIn(removed.ingredient_id, amounts)
+
+    def test_update_unchanged_ingredients_and_tags(self):
+        tags = TagFactory.create_batch(2)
+        recipe = RecipeFactory.create(author=RecipesTests.author, tags=tags)
+        amount = AmountIngredientFactory.create(
+            recipe=recipe, ingredient=IngredientFactory.create(), amount=3
+        )
+        update_data = {
+            "name": "Новое название",
+            "tags": [tag.id for tag in reversed(tags)],
+            "ingredients": [{"id": amount.ingredient_id, "amount": 3}],
+        }
+
+        self.assertEqual(self.patch_recipe_writes(recipe, update_data), {})
+
+        update_data["tags"] = [tags[0].id, TagFactory.create().id]
+        writes = self.patch_recipe_writes(recipe, update_data)
+        table = Recipe.tags.through._meta.db_table
+        self.assertEqual(
+            writes, Counter({("INSERT", table): 1, ("DELETE", table): 1})
+        )
+
+    def test_update_keeps_counters(self):
+        recipe = RecipeFactory.create(author=RecipesTests.author)
+        get_object = RecipeViewSet.get_object
+
+        def get_object_then_favorite(viewset):
+            loaded = get_object(viewset)
+            # a favorite added while the update runs
+            increment(Recipe.objects.filter(pk=recipe.pk), "favorites_count")
+            return loaded
+
+        with mock.patch.object(
+            RecipeViewSet, "get_object", get_object_then_favorite
+        ):
+            response = RecipesTests.author_client.patch(
+                path=reverse(URLS["recipes-detail"], args=[recipe.id]),
+                data={"name": "Новое название"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, "Новое название")
+        self.assertEqual(recipe.favorites_count, 1)
+
     def test_delete(self):
         recipe = RecipeFactory.create(author=RecipesTests.author)
         response = RecipesTests.user_client.delete(
@@ -651,6 +918,35 @@ class RecipesTests(TestCase):
             response.content, RecipeMinifiedSerializer(instance=recipe).data
         )
 
+    def test_category_counters(self):
+        recipe = RecipeFactory.create(author=RecipesTests.author)
+        RecipesTests.author.refresh_from_db()
+        self.assertEqual(
+            RecipesTests.author.recipes_count,
+            Recipe.objects.filter(author=RecipesTests.author).count(),
+        )
+
+        for url, counter in (
+            (URLS["recipes-favorite"], "favorites_count"),
+            (URLS["recipes-shopping_cart"], "shopping_cart_count"),
+        ):
+            path = reverse(url, args=[recipe.id])
+            RecipesTests.user_client.get(path)
+            RecipesTests.user_client.get(path)
+            recipe.refresh_from_db()
+            self.assertEqual(getattr(recipe, counter), 1)
+
+            RecipesTests.user_client.delete(path)
+            recipe.refresh_from_db()
+            self.assertEqual(getattr(recipe, counter), 0)
+
+        recipes_count = RecipesTests.author.recipes_count
+        RecipesTests.author_client.delete(
+            reverse(URLS["recipes-detail"], args=[recipe.id])
+        )
+        RecipesTests.author.refresh_from_db()
+        self.assertEqual(RecipesTests.author.recipes_count, recipes_count - 1)
+
     def test_shopping_cart_delete(self):
         recipe = RecipesTests.recipe
         recipe.users_put_in_cart.add(RecipesTests.user)
@@ -664,6 +960,419 @@ class RecipesTests(TestCase):
         self.assertFalse(is_in_shopping_cart)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_favorite_batch(self):
+        recipes = RecipeFactory.create_batch(3)
+        recipes[0].users_chose_as_favorite.add(RecipesTests.user)
+        missing_id = Recipe.objects.order_by("-pk").first().pk + 1
+        ids = [recipe.pk for recipe in recipes]
+        path = reverse(URLS["recipes-favorite-batch"])
+
+        # the insert, the counters and the check of the recipes not
+        # inserted, the savepoint of the transaction is counted in tests
+        with self.assertNumQueries(5):
+            response = RecipesTests.user_client.post(
+                path,
+                data={"recipes": [*ids, ids[1], missing_id]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {
+                "applied": ids[1:],
+                "duplicates": [ids[1]],
+                "unchanged": [ids[0]],
+                "missing": [missing_id],
+            },
+        )
+        favorites = RecipesTests.user.favorite_recipes.filter(pk__in=ids)
+        self.assertEqual(favorites.count(), 3)
+        recipes[1].refresh_from_db()
+        self.assertEqual(recipes[1].favorites_count, 1)
+
+        # every recipe is removed, none left to check
+        with self.assertNumQueries(4):
+            response = RecipesTests.user_client.delete(
+                path, data={"recipes": ids[:2]}, format="json"
+            )
+        self.assertEqual(response.data["applied"], ids[:2])
+        self.assertEqual(favorites.count(), 1)
+        recipes[1].refresh_from_db()
+        self.assertEqual(recipes[1].favorites_count, 0)
+
+    def test_shopping_cart_batch(self):
+        recipes = RecipeFactory.create_batch(2)
+        ids = [recipe.pk for recipe in recipes]
+        path = reverse(URLS["recipes-shopping_cart-batch"])
+        version = RecipesTests.user.shopping_cart_version
+
+        response = RecipesTests.user_client.post(
+            path, data={"recipes": ids}, format="json"
+        )
+        self.assertEqual(response.data["applied"], ids)
+        RecipesTests.user.refresh_from_db()
+        self.assertEqual(RecipesTests.user.shopping_cart_version, version + 1)
+        self.assertEqual(
+            list(
+                RecipesTests.user.shopping_cart_recipes.filter(
+                    pk__in=ids
+                ).order_by("pk").values_list("pk", flat=True)
+            ),
+            ids,
+        )
+
+        response = RecipesTests.user_client.post(
+            path, data={"recipes": ids}, format="json"
+        )
+        self.assertEqual(response.data["unchanged"], ids)
+        RecipesTests.user.refresh_from_db()
+        self.assertEqual(RecipesTests.user.shopping_cart_version, version + 1)
+
+    def test_batch_invalid(self):
+        path = reverse(URLS["recipes-favorite-batch"])
+        for data in ({}, {"recipes": []}, {"recipes": ["x"]}):
+            with self.subTest(data=data):
+                response = RecipesTests.user_client.post(
+                    path, data=data, format="json"
+                )
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+        response = APIClient().post(
+            path, data={"recipes": [RecipesTests.recipe.pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class RecipeTagsFilterTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def setUp(self):
+        caches["default"].clear()
+        self.client = APIClient()
+        self.breakfast, self.lunch, self.dinner = TagFactory.create_batch(3)
+        self.both = RecipeFactory.create(tags=[self.breakfast, self.lunch])
+        self.breakfast_only = RecipeFactory.create(tags=[self.breakfast])
+        RecipeFactory.create(tags=[self.dinner])
+
+    def get_ids(self, *slugs: str, **params) -> List[int]:
+        response = self.client.get(
+            reverse(URLS["recipes-list"]),
+            data={"tags": list(slugs), "limit": 10, **params},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(recipe["id"] for recipe in response.data["results"])
+
+    def test_any(self):
+        ids = self.get_ids(self.breakfast.slug, self.lunch.slug)
+        self.assertEqual(ids, sorted([self.both.id, self.breakfast_only.id]))
+
+    def test_all(self):
+        ids = self.get_ids(
+            self.breakfast.slug, self.lunch.slug, tags_match="all"
+        )
+        self.assertEqual(ids, [self.both.id])
+        self.assertEqual(
+            self.get_ids(self.breakfast.slug, tags_match="all"),
+            sorted([self.both.id, self.breakfast_only.id]),
+        )
+
+    def test_unknown_slug(self):
+        response = self.client.get(
+            reverse(URLS["recipes-list"]), data={"tags": ["unknown"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_slugs_resolved_from_cache(self):
+        self.get_ids(self.breakfast.slug)
+        with CaptureQueriesContext(connection) as queries:
+            self.get_ids(self.lunch.slug, self.breakfast.slug)
+        self.assertFalse(
+            [
+                query
+                for query in queries.captured_queries
+                if query["sql"].startswith('SELECT "api_tag"."slug"')
+            ]
+        )
+
+    def tag_map_loads(self, *slugs: str) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse(URLS["recipes-list"]), data={"tags": list(slugs)}
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        return sum(
+            query["sql"].startswith('SELECT "api_tag"."slug"')
+            for query in queries.captured_queries
+        )
+
+    def test_unknown_slug_not_reloaded(self):
+        self.get_ids(self.breakfast.slug)
+        for _ in range(2):
+            self.assertEqual(self.tag_map_loads("unknown"), 0)
+            self.assertEqual(
+                self.tag_map_loads(self.breakfast.slug, "unknown"), 0
+            )
+
+    def test_tag_of_other_process(self):
+        self.get_ids(self.breakfast.slug)
+        tag_map = caches["default"].get(CACHE_KEY)
+        supper = TagFactory.create()
+        RecipeFactory.create(tags=[supper])
+        # the map of a process the signals of the save didn't reach
+        caches["default"].set(CACHE_KEY, tag_map)
+        self.assertEqual(len(self.get_ids(supper.slug)), 1)
+
+    def test_changed_slug(self):
+        self.get_ids(self.breakfast.slug)
+        old_slug = self.breakfast.slug
+        self.breakfast.slug = "new-breakfast"
+        self.breakfast.save()
+        self.assertEqual(
+            self.get_ids("new-breakfast"),
+            sorted([self.both.id, self.breakfast_only.id]),
+        )
+        response = self.client.get(
+            reverse(URLS["recipes-list"]), data={"tags": [old_slug]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@unittest.skipIf(
+    connection.vendor == "sqlite",
+    "concurrent writers lock the shared in-memory sqlite database",
+)
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class RecipeCategoryConcurrencyTests(TransactionTestCase):
+    THREADS = 8
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def setUp(self):
+        self.user = CustomUserFactory.create()
+        self.recipe = RecipeFactory.create()
+
+    def hammer(self, method: str, url_name: str) -> list:
+        if url_name.endswith("-batch"):
+            url = reverse(URLS[url_name])
+            data = {"recipes": [self.recipe.pk]}
+        else:
+            url = reverse(URLS[url_name], args=[self.recipe.pk])
+            data = None
+
+        def request(_):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            try:
+                return getattr(client, method)(url, data=data, format="json")
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(self.THREADS) as executor:
+            return list(executor.map(request, range(self.THREADS * 4)))
+
+    def hammer_statuses(self, method: str, url_name: str) -> Counter:
+        return Counter(
+            response.status_code
+            for response in self.hammer(method, url_name)
+        )
+
+    def test_concurrent_toggles(self):
+        categories = (
+            ("recipes-favorite", "favorites_count"),
+            ("recipes-shopping_cart", "shopping_cart_count"),
+        )
+        for url_name, counter in categories:
+            with self.subTest(url_name=url_name):
+                statuses = self.hammer_statuses("get", url_name)
+                self.assertEqual(statuses[status.HTTP_201_CREATED], 1)
+                self.assertEqual(
+                    statuses[status.HTTP_400_BAD_REQUEST],
+                    self.THREADS * 4 - 1,
+                )
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 1)
+
+                statuses = self.hammer_statuses("delete", url_name)
+                self.assertEqual(statuses[status.HTTP_204_NO_CONTENT], 1)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 0)
+
+    def test_concurrent_batches(self):
+        categories = (
+            ("recipes-favorite-batch", "favorites_count"),
+            ("recipes-shopping_cart-batch", "shopping_cart_count"),
+        )
+        for url_name, counter in categories:
+            for method, expected in (("post", 1), ("delete", 0)):
+                with self.subTest(url_name=url_name, method=method):
+                    applied = [
+                        response.data["applied"]
+                        for response in self.hammer(method, url_name)
+                    ]
+                    self.assertEqual(
+                        applied.count([self.recipe.pk]), 1, applied
+                    )
+                    self.recipe.refresh_from_db()
+                    self.assertEqual(getattr(self.recipe, counter), expected)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class ShoppingCartTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = CustomUserFactory.create()
+        cls.user_client = APIClient()
+        cls.user_client.force_authenticate(user=cls.user)
+
+        grams, pieces = MeasurementUnitFactory.create_batch(2)
+        cls.flour_grams = IngredientFactory.create(
+            name="мука", measurement_unit=grams
+        )
+        cls.flour_pieces = IngredientFactory.create(
+            name="мука", measurement_unit=pieces
+        )
+        cls.eggs = IngredientFactory.create(
+            name="яйца", measurement_unit=pieces
+        )
+        for amount in (100, 200):
+            recipe = RecipeFactory.create()
+            recipe.users_put_in_cart.add(cls.user)
+            AmountIngredientFactory.create(
+                recipe=recipe, ingredient=cls.flour_grams, amount=amount
+            )
+            AmountIngredientFactory.create(
+                recipe=recipe, ingredient=cls.flour_pieces, amount=1
+            )
+            AmountIngredientFactory.create(
+                recipe=recipe, ingredient=cls.eggs, amount=2
+            )
+        not_in_cart_recipe = RecipeFactory.create()
+        AmountIngredientFactory.create(
+            recipe=not_in_cart_recipe, ingredient=cls.eggs, amount=10
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH)
+
+    def test_accumulated_ingredients(self):
+        recipes = ShoppingCartTests.user.shopping_cart_recipes.all()
+        with self.assertNumQueries(1):
+            ingredients = list(
+                RecipeViewSet().get_accumulated_ingredients(recipes)
+            )
+
+        grams = ShoppingCartTests.flour_grams.measurement_unit.name
+        pieces = ShoppingCartTests.flour_pieces.measurement_unit.name
+        expected_ingredients = [
+            {"name": "мука", "measurement_unit": grams, "amount": 300},
+            {"name": "мука", "measurement_unit": pieces, "amount": 2},
+            {"name": "яйца", "measurement_unit": pieces, "amount": 4},
+        ]
+        self.assertEqual(ingredients, expected_ingredients)
+
+    def setUp(self):
+        caches["shopping_lists"].clear()
+        ShoppingCartTests.user.refresh_from_db()
+
+    def download(self, file_type: str = "pdf") -> bytes:
+        response = ShoppingCartTests.user_client.get(
+            reverse(URLS["recipes-download_shopping_cart"]),
+            data={"file_type": file_type},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content)
+
+    def test_download_route(self):
+        actions = [
+            extra_action.__name__
+            for extra_action in RecipeViewSet.get_extra_actions()
+            if extra_action.url_path == "download_shopping_cart"
+        ]
+        self.assertEqual(actions, ["download_shopping_cart"])
+
+    def test_download(self):
+        response = ShoppingCartTests.user_client.get(
+            reverse(URLS["recipes-download_shopping_cart"])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(response.streaming_content))
+
+    def test_download_text(self):
+        grams = ShoppingCartTests.flour_grams.measurement_unit.name
+        pieces = ShoppingCartTests.flour_pieces.measurement_unit.name
+        expected_text = (
+            f"мука 300.0 {grams}\nмука 2.0 {pieces}\nяйца 4.0 {pieces}"
+        )
+        self.assertEqual(self.download("txt").decode(), expected_text)
+
+    def test_download_invalid_file_type(self):
+        response = ShoppingCartTests.user_client.get(
+            reverse(URLS["recipes-download_shopping_cart"]),
+            data={"file_type": "docx"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_repeat_download_is_cached(self):
+        for file_type in ("pdf", "txt"):
+            content = self.download(file_type)
+            # the cart version only
+            with self.assertNumQueries(1):
+                self.assertEqual(self.download(file_type), content)
+
+    def test_cart_change_invalidates_cache(self):
+        self.download("txt")
+        recipe = RecipeFactory.create()
+        AmountIngredientFactory.create(
+            recipe=recipe, ingredient=ShoppingCartTests.eggs, amount=1
+        )
+
+        response = ShoppingCartTests.user_client.get(
+            reverse(URLS["recipes-shopping_cart"], args=[recipe.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ShoppingCartTests.user.refresh_from_db()
+        self.assertIn("яйца 5.0", self.download("txt").decode())
+
+        response = ShoppingCartTests.user_client.delete(
+            reverse(URLS["recipes-shopping_cart"], args=[recipe.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        ShoppingCartTests.user.refresh_from_db()
+        self.assertIn("яйца 4.0", self.download("txt").decode())
+
+    def test_ingredients_edit_invalidates_cache(self):
+        self.download("txt")
+        recipe = ShoppingCartTests.user.shopping_cart_recipes.first()
+        author_client = APIClient()
+        author_client.force_authenticate(user=recipe.author)
+        response = author_client.patch(
+            reverse(URLS["recipes-detail"], args=[recipe.id]),
+            data=json.dumps(
+                {
+                    "ingredients": [
+                        {"id": ShoppingCartTests.eggs.id, "amount": 10}
+                    ]
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        ShoppingCartTests.user.refresh_from_db()
+        self.assertIn("яйца 12.0", self.download("txt").decode())
+
 
 @override_settings(MEDIA_ROOT=MEDIA_PATH)
 class SubscriptionTest(TestCase):
@@ -749,6 +1458,53 @@ class SubscriptionTest(TestCase):
         prepared_response_data = self.get_prepared_response_data(response)
         self.assertJSONEqual(prepared_response_data, expected_response)
 
+    def test_list_recipes_limit(self):
+        prolific_author = SubscriptionTest.authors[0]
+        RecipeFactory.create_batch(3, author=prolific_author)
+        expected_ids = list(
+            prolific_author.recipes.order_by("-pub_date", "-id").values_list(
+                "id", flat=True
+            )[:2]
+        )
+
+        with self.assertNumQueries(3):
+            response = SubscriptionTest.user_client.get(
+                path=reverse(URLS["subscriptions-list"]),
+                data={"recipes_limit": 2},
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        leaders = {leader["id"]: leader for leader in response.data["results"]}
+        prolific_leader = leaders[prolific_author.id]
+        self.assertEqual(
+            [recipe["id"] for recipe in prolific_leader["recipes"]],
+            expected_ids,
+        )
+        self.assertEqual(prolific_leader["recipes_count"], 4)
+        self.assertTrue(prolific_leader["is_subscribed"])
+        for leader in leaders.values():
+            self.assertLessEqual(len(leader["recipes"]), 2)
+
+    def test_list_invalid_recipes_limit(self):
+        for recipes_limit in ("0", "-1", "many"):
+            response = SubscriptionTest.user_client.get(
+                path=reverse(URLS["subscriptions-list"]),
+                data={"recipes_limit": recipes_limit},
+            )
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_create_recipes_limit(self):
+        leader = CustomUserFactory.create()
+        RecipeFactory.create_batch(3, author=leader)
+        response = SubscriptionTest.user_client.get(
+            path=reverse(URLS["subscriptions-detail"], args=[leader.id]),
+            data={"recipes_limit": 1},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["recipes"]), 1)
+        self.assertEqual(response.data["recipes_count"], 3)
+
     def test_create(self):
         leader = CustomUserFactory.create()
         response = SubscriptionTest.user_client.get(
@@ -764,6 +1520,18 @@ class SubscriptionTest(TestCase):
             excepted,
         )
 
+    def test_followers_count(self):
+        leader = CustomUserFactory.create()
+        path = reverse(URLS["subscriptions-detail"], args=[leader.id])
+
+        SubscriptionTest.user_client.get(path)
+        leader.refresh_from_db()
+        self.assertEqual(leader.followers_count, 1)
+
+        SubscriptionTest.user_client.delete(path)
+        leader.refresh_from_db()
+        self.assertEqual(leader.followers_count, 0)
+
     def test_delete(self):
         leader = CustomUserFactory.create()
         Subscription.objects.create(
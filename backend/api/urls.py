@@ -1,7 +1,9 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import path
 from django.urls.conf import re_path
 from rest_framework.routers import DefaultRouter
 
+from api.async_views import async_read_urls
 from api.views import (
     IngredientViewSet,
     RecipeViewSet,
@@ -19,7 +21,7 @@ router.register("recipes", RecipeViewSet, basename="recipes")
 
 
 urlpatterns = [
-    path("", include(router.urls)),
+    *router.urls,
     path(
         "users/subscriptions/",
         SubscriptionList.as_view(),
@@ -31,3 +33,6 @@ urlpatterns = [
         name="subscriptions-detail",
     ),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_read_urls(urlpatterns)
@@ -18,23 +18,19 @@ def transliterate_slugify(text: str):
     raise NotFoundLangException("Invalid language")
 
 
-def is_distinct(items):
-    distinct = list(set(items))
-    try:
-        distinct.sort()
-    except TypeError:
-        distinct.sort(key=lambda item: item.pk)
-
-    try:
-        items.sort()
-    except TypeError:
-        items.sort(key=lambda item: item.pk)
-    return items == distinct
+def is_distinct(items) -> bool:
+    return len(set(items)) == len(items)
 
 
 def get_nonexistent_ids(model: models.Model, ids_objects) -> List[int]:
-    not_exists = []
-    for id_object in ids_objects:
-        if not model.objects.filter(pk=id_object).exists():
-            not_exists.append(id_object)
-    return not_exists
+    to_pk = model._meta.pk.to_python
+    existing = set(
+        model.objects.filter(
+            pk__in=[to_pk(id_object) for id_object in ids_objects]
+        ).values_list("pk", flat=True)
+    )
+    return [
+        id_object
+        for id_object in ids_objects
+        if to_pk(id_object) not in existing
+    ]
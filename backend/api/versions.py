@@ -0,0 +1,53 @@
+from typing import Dict
+from uuid import uuid4
+
+from django.utils import timezone
+
+from api.models import CacheVersion
+
+INGREDIENTS_CATALOG = "ingredients-catalog"
+TAGS = "tags"
+# authors shown in recipes, new users are not counted
+USERS = "users"
+# other recipe changes are tracked by Recipe.updated_at
+RECIPES_DELETED = "recipes-deleted"
+
+
+def get_version(key: str) -> str:
+    version = (
+        CacheVersion.objects.filter(key=key)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or ""
+
+
+def get_versions(*keys: str) -> Dict[str, CacheVersion]:
+    """Versions of the keys with the time they were bumped, one query."""
+    return CacheVersion.objects.in_bulk(keys)
+
+
+def bump_version(key: str) -> str:
+    # a random token instead of a counter never repeats,
+    # even after a rolled back transaction
+    version = uuid4().hex
+    CacheVersion.objects.update_or_create(
+        key=key, defaults={"version": version}
+    )
+    return version
+
+
+def bump_versions(*keys: str) -> str:
+    """Bump the keys to one new token, an update and at most an insert.
+
+    The rows are created on the first bump of a key."""
+    version = uuid4().hex
+    updated = CacheVersion.objects.filter(key__in=keys).update(
+        version=version, updated_at=timezone.now()
+    )
+    if updated < len(keys):
+        CacheVersion.objects.bulk_create(
+            (CacheVersion(key=key, version=version) for key in keys),
+            ignore_conflicts=True,
+        )
+    return version
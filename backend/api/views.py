@@ -1,8 +1,10 @@
 import io
-from collections import OrderedDict
+from collections import Counter
 
+from django.db import transaction
+from django.db.models import F, QuerySet, Sum
 from django.http.response import FileResponse
-from fpdf import FPDF
+from django_filters.utils import translate_validation
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import (
@@ -13,21 +15,57 @@ from rest_framework.generics import (
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from api.constants import IS_FAVORITED_VALUES, IS_IN_SHOPING_CART_VALUES
+from api.categories import (
+    add_many_to_category,
+    add_to_category,
+    remove_from_category,
+    remove_many_from_category,
+)
+from api.conditional import (
+    Validators,
+    conditional_get,
+    latest,
+    recipes_state,
+    versions_state,
+)
+from api.constants import (
+    IMAGE_CARD,
+    IS_FAVORITED_VALUES,
+    IS_IN_SHOPING_CART_VALUES,
+    SHOPPING_LIST_FILE_TYPES,
+)
 from api.filters import IngredientFilter, RecipeFilter
-from api.mixins import ListRetrievViewSet
-from api.models import AmountIngredient, Ingredient, Recipe, Subscription, Tag
-from api.pagintors import CustomLimitOffsetPagination
+from api.ingredient_index import get_ingredient_index
+from api.mixins import LeadersRecipesMixin, ListRetrievViewSet
+from api.models import (
+    AmountIngredient,
+    Ingredient,
+    Recipe,
+    Subscription,
+    Tag,
+    subscribed_by,
+)
+from api.pagintors import CustomLimitOffsetPagination, RecipePagination
 from api.permissions import IsAuthor
+from api.response_cache import (
+    RECIPES,
+    SHARED,
+    cache_anonymous,
+    recipe_generation,
+)
 from api.serializers import (
-    IngredientSerializer,
+    CompiledIngredientSerializer,
+    CompiledRecipeSerializer,
+    CompiledTagSerializer,
     RecipeCreateUpdateSerializer,
+    RecipeIdsSerializer,
     RecipeMinifiedSerializer,
     RecipeSerializer,
-    TagSerializer,
     UserWithRecipesSerializer,
 )
+from api.shopping_list import bump_shopping_cart_version, get_shopping_list
 from api.validations import ValidationResult, validate_query_params
+from api.versions import INGREDIENTS_CATALOG, RECIPES_DELETED, TAGS, USERS
 from users.models import CustomUser
 
 
@@ -44,13 +82,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
         "favorite": [IsAuthenticated],
     }
     filter_class = RecipeFilter
-    pagination_class = CustomLimitOffsetPagination
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            return queryset.for_read(self.request.user)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == "list":
+            context["image_variant"] = IMAGE_CARD
+        return context
 
     def get_serializer_class(self):
         if self.request.method in ("POST", "PUT", "PATCH"):
             return RecipeCreateUpdateSerializer
-        else:
-            return RecipeSerializer
+        if self.action in ("list", "retrieve"):
+            # the read path, the same JSON as RecipeSerializer
+            return CompiledRecipeSerializer
+        return RecipeSerializer
 
     def get_permissions(self):
         try:
@@ -86,15 +138,61 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return ValidationResult(True, "is_in_shoping_cart", "")
 
+    def get_validators(self) -> Validators:
+        """Changes of recipes move the latest updated_at, deletions and
+        changes of the related rows bump versions, so the validators of
+        the whole feed fit every filter and page."""
+        user = self.request.user
+        keys = [TAGS, INGREDIENTS_CATALOG, USERS]
+        recipes = Recipe.objects.all()
+        if self.action == "retrieve":
+            pk = self.kwargs["pk"]
+            if not pk.isdigit():
+                # no such recipe, the 404 is left to get_object()
+                return None
+            recipes = recipes.filter(pk=pk)
+        else:
+            keys.append(RECIPES_DELETED)
+        versions, versions_time = versions_state(*keys)
+        updated_at, flags = recipes_state(user, recipes)
+        state = (updated_at, versions, flags)
+        if user.is_authenticated:
+            return Validators(state)
+        return Validators(state, latest(updated_at, versions_time))
+
+    def get_cache_generations(self) -> tuple:
+        if self.action == "retrieve":
+            pk = self.kwargs["pk"]
+            # /recipes/01/ is the same recipe as /recipes/1/
+            if pk.isdigit():
+                pk = int(pk)
+            return SHARED, recipe_generation(pk)
+        return SHARED, RECIPES
+
     @validate_query_params(
         [validate_is_favorited, validate_is_in_shoping_cart]
     )
+    @cache_anonymous
+    @conditional_get
     def list(self, request, *args, **kwargs):
-        return super().list(self, request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    @cache_anonymous
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        # the author's recipes_count is decremented by a signal
+        with transaction.atomic():
+            bump_shopping_cart_version(
+                CustomUser.objects.filter(shopping_cart_recipes=instance)
+            )
+            instance.delete()
+
     def perform_update(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -103,48 +201,99 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
     def add_recipe_in_category(
-        self, queryset_users, curent_user, recipe
+        self, related_name_category: str, curent_user, recipe_pk: int
     ) -> Response:
-        if queryset_users.filter(pk=curent_user.pk).exists():
+        if not add_to_category(
+            related_name_category, recipe_pk, curent_user.pk
+        ):
+            if not Recipe.objects.filter(pk=recipe_pk).exists():
+                return Response(
+                    status=status.HTTP_400_BAD_REQUEST,
+                    data={"errors": "the recipe isn't exists"},
+                )
             return Response(
                 status=status.HTTP_400_BAD_REQUEST,
                 data={"errors": "the recipe has already been added"},
             )
-
-        queryset_users.add(curent_user)
+        recipe = Recipe.objects.minified().get(pk=recipe_pk)
         serializer = RecipeMinifiedSerializer(recipe)
         return Response(status=status.HTTP_201_CREATED, data=serializer.data)
 
     def del_recipe_from_category(
-        self, queryset_users, curent_user
+        self, related_name_category: str, curent_user, recipe_pk: int
     ) -> Response:
-        if not queryset_users.filter(pk=curent_user.pk).exists():
+        if not remove_from_category(
+            related_name_category, recipe_pk, curent_user.pk
+        ):
+            if not Recipe.objects.filter(pk=recipe_pk).exists():
+                return Response(
+                    status=status.HTTP_400_BAD_REQUEST,
+                    data={"errors": "the recipe isn't exists"},
+                )
             return Response(
                 status=status.HTTP_400_BAD_REQUEST,
                 data={"errors": "Recipe not added"},
             )
-        queryset_users.remove(curent_user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def handle_recipe_category(
-        self, request, recipe_pk, related_name_category: str
+        self, request, recipe_pk: str, related_name_category: str
     ) -> Response:
-        try:
-            recipe = Recipe.objects.get(pk=recipe_pk)
-        except Recipe.DoesNotExist:
+        if not recipe_pk.isdigit():
             return Response(
                 status=status.HTTP_400_BAD_REQUEST,
                 data={"errors": "the recipe isn't exists"},
             )
-
-        category_users = getattr(recipe, related_name_category)
         if request.method == "GET":
             return self.add_recipe_in_category(
-                category_users, request.user, recipe
+                related_name_category, request.user, int(recipe_pk)
             )
 
         else:
-            return self.del_recipe_from_category(category_users, request.user)
+            return self.del_recipe_from_category(
+                related_name_category, request.user, int(recipe_pk)
+            )
+
+    def handle_recipes_batch(
+        self, request, related_name_category: str
+    ) -> Response:
+        """Add (POST) or remove (DELETE) the listed recipes in one go.
+
+        One statement inserts or deletes the through rows, one updates
+        the counters of the rows it changed and, unless every recipe
+        was changed, one reads which of the others exist."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["recipes"]
+        unique_ids = list(dict.fromkeys(ids))
+        if request.method == "POST":
+            changed = add_many_to_category(
+                related_name_category, unique_ids, request.user.pk
+            )
+        else:
+            changed = remove_many_from_category(
+                related_name_category, unique_ids, request.user.pk
+            )
+        existing = changed
+        if len(changed) < len(unique_ids):
+            existing = set(
+                Recipe.objects.filter(pk__in=unique_ids).values_list(
+                    "pk", flat=True
+                )
+            )
+        repeats = Counter(ids)
+        return Response(
+            {
+                "applied": [pk for pk in unique_ids if pk in changed],
+                "duplicates": [pk for pk in unique_ids if repeats[pk] > 1],
+                "unchanged": [
+                    pk
+                    for pk in unique_ids
+                    if pk in existing and pk not in changed
+                ],
+                "missing": [pk for pk in unique_ids if pk not in existing],
+            }
+        )
 
     @action(detail=True, methods=["get", "delete"], url_name="favorite")
     def favorite(self, request, pk=None):
@@ -154,106 +303,179 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["get", "delete"], url_name="shopping_cart")
     def shopping_cart(self, request, pk=None):
-        return self.handle_recipe_category(request, pk, "users_put_in_cart")
-
-    def get_accumulated_ingredients(self, recipes) -> OrderedDict:
-        ingredients = {}
-        amounts_ingredients = AmountIngredient.objects.filter(
-            recipe__in=recipes
-        ).values(
-            "amount", "ingredient__name", "ingredient__measurement_unit__name"
+        response = self.handle_recipe_category(
+            request, pk, "users_put_in_cart"
         )
-        for amount_ingredient in amounts_ingredients:
-            name = f"{amount_ingredient['ingredient__name']}"
-            amount = amount_ingredient["amount"]
-            measurement_unit = amount_ingredient[
-                "ingredient__measurement_unit__name"
-            ]
-
-            ingredient = ingredients.get(name)
-            if ingredient:
-                ingredient["amount"] += amount
-            else:
-                ingredients[name] = {
-                    "amount": amount,
-                    "measurement_unit": measurement_unit,
-                }
-
-        return OrderedDict(
-            sorted(ingredients.items(), key=lambda item: item[0])
+        if response.status_code in (
+            status.HTTP_201_CREATED,
+            status.HTTP_204_NO_CONTENT,
+        ):
+            bump_shopping_cart_version(
+                CustomUser.objects.filter(pk=request.user.pk)
+            )
+        return response
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="favorite",
+        url_name="favorite-batch",
+    )
+    def favorite_batch(self, request):
+        return self.handle_recipes_batch(request, "users_chose_as_favorite")
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="shopping_cart",
+        url_name="shopping_cart-batch",
+    )
+    def shopping_cart_batch(self, request):
+        response = self.handle_recipes_batch(request, "users_put_in_cart")
+        if response.data["applied"]:
+            bump_shopping_cart_version(
+                CustomUser.objects.filter(pk=request.user.pk)
+            )
+        return response
+
+    def get_accumulated_ingredients(self, recipes) -> QuerySet:
+        return (
+            AmountIngredient.objects.filter(recipe__in=recipes)
+            .values(
+                name=F("ingredient__name"),
+                measurement_unit=F("ingredient__measurement_unit__name"),
+            )
+            .annotate(amount=Sum("amount"))
+            .order_by("name", "measurement_unit")
         )
 
+    def validate_file_type(self):
+        file_type: str = self.request.query_params.get("file_type", "pdf")
+        if file_type not in SHOPPING_LIST_FILE_TYPES:
+            return ValidationResult(
+                False,
+                "file_type",
+                "Invalid value. Acceptable 'pdf' and 'txt'",
+            )
+        return ValidationResult(True, "file_type", "")
+
     @action(
         detail=False,
         methods=["get"],
         url_path="download_shopping_cart",
         url_name="download_shopping_cart",
     )
+    @validate_query_params([validate_file_type])
     def download_shopping_cart(self, request):
-        recipes = request.user.shopping_cart_recipes.all()
-        ingredients_amounts = self.get_accumulated_ingredients(recipes)
-        pdf = FPDF()
-
-        pdf.add_font(
-            "DejaVu", "", "./api/fonts/DejaVuSansCondensed.ttf", uni=True
-        )
-        pdf.set_font("DejaVu", "", 14)
-        pdf.add_page()
-        for ingredient_name, amount_measurement in ingredients_amounts.items():
-            text = (
-                f'{ingredient_name} {amount_measurement["amount"]}'
-                f' {amount_measurement["measurement_unit"]}'
-            )
-            pdf.cell(0, 10, txt=text, ln=1)
-
-        string_file = pdf.output(dest="S")
-        response = FileResponse(
-            io.BytesIO(string_file.encode("latin1")),
-            content_type="application/pdf",
+        file_type = request.query_params.get("file_type", "pdf")
+        content_type, filename = SHOPPING_LIST_FILE_TYPES[file_type]
+        content = get_shopping_list(
+            request.user,
+            file_type,
+            lambda: self.get_accumulated_ingredients(
+                request.user.shopping_cart_recipes.all()
+            ).iterator(),
         )
-        response[
-            "Content-Disposition"
-        ] = 'attachment; filename="shopong-list.pdf"'
+        response = FileResponse(io.BytesIO(content), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
 
         return response
 
 
 class IngredientViewSet(ListRetrievViewSet):
-    queryset = Ingredient.objects.all().order_by("id")
-    serializer_class = IngredientSerializer
+    queryset = Ingredient.objects.select_related("measurement_unit").order_by(
+        "id"
+    )
+    serializer_class = CompiledIngredientSerializer
     permission_classes = [AllowAny]
     filter_class = IngredientFilter
 
+    def get_validators(self) -> Validators:
+        # the catalog version is checked by the index, no query per request
+        return Validators(get_ingredient_index().version)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        filterset = self.filter_class(
+            request.query_params, queryset=self.get_queryset()
+        )
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+
+        params = filterset.form.cleaned_data
+        if not params.get("name") or params.get("search") == "fuzzy":
+            return super().list(request, *args, **kwargs)
+
+        # autocomplete is served from the in-process catalog index
+        limit = params.get("limit")
+        return Response(
+            get_ingredient_index().search(
+                params["name"], int(limit) if limit else None
+            )
+        )
+
 
 class TagViewSet(ListRetrievViewSet):
     queryset = Tag.objects.all()
-    serializer_class = TagSerializer
+    serializer_class = CompiledTagSerializer
     permission_classes = [AllowAny]
 
+    def get_validators(self) -> Validators:
+        versions, versions_time = versions_state(TAGS)
+        return Validators(versions, versions_time)
 
-class SubscriptionList(ListAPIView):
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class SubscriptionList(LeadersRecipesMixin, ListAPIView):
     serializer_class = UserWithRecipesSerializer
     pagination_class = CustomLimitOffsetPagination
 
     def get_queryset(self):
-        leaders = CustomUser.objects.filter(
-            leader_subscriptions__follower=self.request.user
-        ).all()
+        leaders = (
+            CustomUser.objects.filter(
+                leader_subscriptions__follower=self.request.user
+            )
+            .annotate(is_subscribed=subscribed_by(self.request.user))
+            .order_by("id")
+        )
         return leaders
 
+    @validate_query_params([LeadersRecipesMixin.validate_recipes_limit])
+    def list(self, request, *args, **kwargs):
+        leaders = self.paginate_queryset(self.get_queryset())
+        self.prefetch_recipes(leaders)
+        serializer = self.get_serializer(leaders, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
-class SubscriptionCreateDestroy(GenericAPIView):
+class SubscriptionCreateDestroy(LeadersRecipesMixin, GenericAPIView):
     def delete(self, request, user_id):
         subscription = get_object_or_404(
             Subscription, follower=request.user, leader_id=user_id
         )
-        subscription.delete()
+        # the leader's followers_count is updated by a signal
+        with transaction.atomic():
+            subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @validate_query_params([LeadersRecipesMixin.validate_recipes_limit])
     def get(self, request, user_id):
         kwargs = {"context": self.get_serializer_context()}
         leader = get_object_or_404(CustomUser, id=user_id)
 
-        Subscription.objects.create(follower=request.user, leader=leader)
+        with transaction.atomic():
+            Subscription.objects.create(follower=request.user, leader=leader)
+        self.prefetch_recipes([leader])
         serializer = UserWithRecipesSerializer(instance=leader, **kwargs)
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
@@ -1,7 +1,25 @@
 import os
 
+from asgiref.sync import ThreadSensitiveContext
 from django.core.asgi import get_asgi_application
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+
+class RequestThreadASGIHandler(ASGIHandler):
+    """ASGIHandler running the sync code of each request in its own thread.
+
+    Django 3.2 runs thread sensitive sync code of all requests, the
+    sync views among it, in one thread. The request_started and
+    request_finished signals run in the thread of the request too, so
+    its database connection is closed there."""
+
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+# sets Django up the way get_asgi_application() does
+get_asgi_application()
+application = RequestThreadASGIHandler()
@@ -15,6 +15,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "colorfield",
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -72,6 +74,82 @@ DATABASES = {
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shopping_lists": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "shopping-lists",
+        "TIMEOUT": 60 * 60 * 24,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.environ.get("SHOPPING_LIST_CACHE_MAX_ENTRIES", 256)
+            ),
+        },
+    },
+    # key to user lookups of the token authentication, a logout
+    # reaches other processes only with a shared backend, until then
+    # the timeout bounds the life of a deleted token
+    "tokens": {
+        "BACKEND": os.environ.get(
+            "TOKEN_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("TOKEN_CACHE_LOCATION", "tokens"),
+        "TIMEOUT": int(os.environ.get("TOKEN_CACHE_TIMEOUT", 60)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.environ.get("TOKEN_CACHE_MAX_ENTRIES", 10000)
+            ),
+        },
+    },
+    # pages of the recipe feed served to anonymous users, a process
+    # local backend is enough: the generation tokens the keys are made
+    # of are CacheVersion rows, a shared one (file, memcached) saves
+    # rendering a page in every process
+    "responses": {
+        "BACKEND": os.environ.get(
+            "RESPONSE_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("RESPONSE_CACHE_LOCATION", "responses"),
+        "TIMEOUT": int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 60 * 10)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1024)
+            ),
+        },
+    },
+}
+
+# "asgi" under uvicorn workers, where the hot reads are async views
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+ASYNC_READ_VIEWS = SERVER_MODE == "asgi"
+
+QUERY_INSTRUMENTATION = (
+    os.environ.get("QUERY_INSTRUMENTATION", "false").lower() == "true"
+)
+
+INGREDIENT_INDEX_CHECK_INTERVAL = float(
+    os.environ.get("INGREDIENT_INDEX_CHECK_INTERVAL", 5)
+)
+
+# the slug to id map of the tags filter, a tag change reaches other
+# processes when their copy expires
+TAG_MAP_CACHE_TIMEOUT = int(os.environ.get("TAG_MAP_CACHE_TIMEOUT", 60))
+
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.environ.get("RECIPE_IMAGE_MAX_SIZE", 15 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get("RECIPE_IMAGE_MAX_PIXELS", 40_000_000)
+)
+
+IMAGE_WORKER_POLL_INTERVAL = float(
+    os.environ.get("IMAGE_WORKER_POLL_INTERVAL", 2)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation."
@@ -124,7 +202,7 @@ DJOSER = {
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend"
@@ -132,4 +210,8 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
@@ -0,0 +1,202 @@
+"""Throughput and latency of the hot reads under concurrent slow clients.
+
+Starts gunicorn with sync workers (SERVER_MODE=wsgi) and with uvicorn
+workers (SERVER_MODE=asgi) in turn, on the same number of workers.
+Fast clients request the recipe feed, a recipe, tags and the
+ingredient autocomplete in a loop, while slow clients trickle their
+request headers a byte at a time, as clients on bad mobile networks
+do. A sync worker is held by a slow client until its request is read.
+
+Needs the same environment as manage.py, gunicorn and uvicorn. A
+throwaway database is created and filled. Run from the backend
+directory:
+    python -m benchmarks.asgi_load
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from benchmarks.utils import (
+    name_server_database,
+    setup_django,
+    temporary_database,
+)
+
+WORKERS = 2
+FAST_CLIENTS = 16
+SLOW_CLIENTS = (0, 4, 16)
+SLOW_BYTE_INTERVAL = 0.2
+DURATION = 10
+PORT = 8765
+RECIPES = 200
+PATHS = (
+    "/api/recipes/?limit=6",
+    "/api/recipes/{recipe}/",
+    "/api/tags/",
+    "/api/ingredients/?name=мол",
+)
+COMMANDS = {
+    "wsgi": ["backend.wsgi:application"],
+    "asgi": [
+        "backend.asgi:application",
+        "--worker-class",
+        "uvicorn.workers.UvicornWorker",
+    ],
+}
+
+
+def fill_database(recipes: int) -> int:
+    from api.tests.factories import (
+        AmountIngredientFactory,
+        IngredientFactory,
+        RecipeFactory,
+        TagFactory,
+    )
+
+    tags = TagFactory.create_batch(6)
+    ingredients = IngredientFactory.create_batch(50, name="молоко")
+    recipe = None
+    for number in range(recipes):
+        # the image file is not served by the benchmarked views
+        recipe = RecipeFactory.create(
+            image="recipes/benchmark.png", tags=tags[number % 3::3]
+        )
+        for ingredient in ingredients[number % 10::10]:
+            AmountIngredientFactory.create(
+                recipe=recipe, ingredient=ingredient
+            )
+    return recipe.pk
+
+
+def request_bytes(path: str) -> bytes:
+    path = quote(path, safe="/?=&")
+    return (
+        f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode()
+
+
+async def fetch(path: str) -> float:
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    writer.write(request_bytes(path))
+    await writer.drain()
+    status = await reader.readline()
+    await reader.read()
+    writer.close()
+    if b" 200 " not in status:
+        raise RuntimeError(f"{path}: {status!r}")
+    return time.perf_counter() - started
+
+
+async def fast_client(paths, deadline: float, latencies: list):
+    number = 0
+    while time.perf_counter() < deadline:
+        latencies.append(await fetch(paths[number % len(paths)]))
+        number += 1
+
+
+async def slow_client(path: str, deadline: float):
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(
+                "127.0.0.1", PORT
+            )
+            for byte in request_bytes(path):
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(SLOW_BYTE_INTERVAL)
+                if time.perf_counter() >= deadline:
+                    break
+            writer.close()
+        except OSError:
+            await asyncio.sleep(SLOW_BYTE_INTERVAL)
+
+
+async def load(paths, slow_clients: int) -> list:
+    latencies = []
+    deadline = time.perf_counter() + DURATION
+    await asyncio.gather(
+        *(
+            fast_client(paths[number:] + paths[:number], deadline, latencies)
+            for number in range(FAST_CLIENTS)
+        ),
+        *(slow_client(paths[0], deadline) for _ in range(slow_clients)),
+    )
+    return latencies
+
+
+def percentile(latencies: list, share: float) -> float:
+    """Latency in milliseconds, NaN when no request was answered."""
+    if not latencies:
+        return float("nan")
+    return latencies[int(len(latencies) * share)] * 1000
+
+
+def wait_until_up(paths):
+    for _ in range(100):
+        try:
+            asyncio.run(fetch(paths[-1]))
+            return
+        except (OSError, RuntimeError):
+            time.sleep(0.1)
+    raise RuntimeError("the server did not start")
+
+
+def run_server(mode: str, database_name: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SERVER_MODE": mode,
+        "DB_NAME": database_name,
+        "DEBUG": "false",
+    }
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            *COMMANDS[mode],
+            "--bind",
+            f"127.0.0.1:{PORT}",
+            "--workers",
+            str(WORKERS),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+
+
+def main():
+    setup_django()
+    database_name = name_server_database("asgi_load")
+
+    with temporary_database():
+        recipe = fill_database(RECIPES)
+        paths = [path.format(recipe=recipe) for path in PATHS]
+        print(
+            f"{'mode':>5} {'slow clients':>13} {'requests/s':>11}"
+            f" {'p50, ms':>8} {'p99, ms':>8}"
+        )
+        for mode in COMMANDS:
+            server = run_server(mode, database_name)
+            try:
+                wait_until_up(paths)
+                for slow_clients in SLOW_CLIENTS:
+                    latencies = sorted(asyncio.run(load(paths, slow_clients)))
+                    print(
+                        f"{mode:>5} {slow_clients:>13}"
+                        f" {len(latencies) / DURATION:>11.1f}"
+                        f" {percentile(latencies, 0.5):>8.1f}"
+                        f" {percentile(latencies, 0.99):>8.1f}"
+                    )
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
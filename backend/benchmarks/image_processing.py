@@ -0,0 +1,79 @@
+"""Request and worker time per recipe image upload.
+
+The request column compares the previous Base64ImageField, which
+decodes and verifies the image with Pillow inside the request, with
+RecipeImageField storing the upload as is. The worker column is the
+time process_images spends rendering all variants of one upload.
+
+Needs the same environment as manage.py, no database is used.
+Run from the backend directory:
+    python -m benchmarks.image_processing
+"""
+import base64
+from functools import partial
+from io import BytesIO
+
+from PIL import Image, ImageFilter
+
+from benchmarks.utils import setup_django, timeit
+
+UPLOADS = (
+    ((1280, 960), "JPEG"),
+    ((3000, 2000), "JPEG"),
+    ((6000, 4000), "JPEG"),
+    ((2000, 1500), "PNG"),
+)
+REPEATS = 5
+
+
+def make_photo(size, image_format: str) -> bytes:
+    """Noisy gradient, compressed about as well as a photo."""
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 20).filter(ImageFilter.GaussianBlur(2))
+    red = Image.blend(gradient, noise, 0.5)
+    image = Image.merge("RGB", (red, gradient, gradient.transpose(0)))
+    content = BytesIO()
+    image.save(content, image_format)
+    return content.getvalue()
+
+
+def main():
+    setup_django()
+    from drf_extra_fields.fields import Base64ImageField
+
+    from api.fields import RecipeImageField
+    from api.images import render_variants
+
+    print(
+        f"{'upload':>16} {'size, KB':>9} {'variants, KB':>13}"
+        f" {'request before, ms':>19} {'request, ms':>12}"
+        f" {'worker, ms':>11}"
+    )
+    for size, image_format in UPLOADS:
+        content = make_photo(size, image_format)
+        encoded = base64.b64encode(content).decode()
+        variants = render_variants(BytesIO(content))
+        variants_size = sum(
+            len(rendered)
+            for contents in variants.values()
+            for rendered in contents.values()
+        )
+        before = timeit(
+            partial(Base64ImageField().to_internal_value, encoded), REPEATS
+        )
+        after = timeit(
+            partial(RecipeImageField().to_internal_value, encoded), REPEATS
+        )
+        worker = timeit(
+            lambda: render_variants(BytesIO(content)), REPEATS
+        )
+        upload = f"{size[0]}x{size[1]} {image_format.lower()}"
+        print(
+            f"{upload:>16} {len(content) // 1024:>9}"
+            f" {variants_size // 1024:>13} {before['mean']:>19.1f}"
+            f" {after['mean']:>12.1f} {worker['mean']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Peak memory of decoding a base64 recipe image in the request.
+
+Compares Base64ImageField of drf-extra-fields, which decodes the whole
+payload into bytes, copies it into a ContentFile and verifies it with
+Pillow, with the chunked RecipeImageField. The parsed JSON string
+itself is allocated before the field runs and is not counted.
+
+Needs the same environment as manage.py, no database is used.
+Run from the backend directory:
+    python -m benchmarks.image_upload_memory
+"""
+import base64
+import math
+import tracemalloc
+from io import BytesIO
+
+from PIL import Image
+
+from benchmarks.utils import setup_django, timeit
+
+# decoded upload sizes, the last one is close to the nginx body limit
+UPLOAD_SIZES = (1, 5, 14)
+REPEATS = 3
+
+
+def make_upload(megabytes: int) -> str:
+    """Noise PNG, it barely compresses and weighs about the given MB."""
+    side = int(math.sqrt(megabytes * 1024 * 1024 / 3))
+    channels = [Image.effect_noise((side, side), 128) for _ in range(3)]
+    content = BytesIO()
+    Image.merge("RGB", channels).save(content, "PNG", compress_level=1)
+    return "data:image/png;base64," + base64.b64encode(
+        content.getvalue()
+    ).decode()
+
+
+def peak_memory(decode, payload: str) -> int:
+    tracemalloc.start()
+    try:
+        upload = decode(payload)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    upload.close()
+    return peak
+
+
+def main():
+    setup_django()
+    from drf_extra_fields.fields import Base64ImageField
+
+    from api.fields import RecipeImageField
+
+    fields = {
+        "Base64ImageField": Base64ImageField().to_internal_value,
+        "RecipeImageField": RecipeImageField().to_internal_value,
+    }
+    print(f"{'upload, MB':>10} {'field':>17} {'peak, MB':>9} {'mean, ms':>9}")
+    for megabytes in UPLOAD_SIZES:
+        payload = make_upload(megabytes)
+        for name, decode in fields.items():
+            peak = peak_memory(decode, payload)
+            timings = timeit(lambda: decode(payload).close(), REPEATS)
+            print(
+                f"{megabytes:>10} {name:>17} {peak / 1024 / 1024:>9.1f}"
+                f" {timings['mean']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Latency of ingredient search over the bundled catalog.
+
+Compares the database prefix and fuzzy modes of IngredientFilter
+with the in-process index used by IngredientViewSet.
+
+Needs the same environment as manage.py, a temporary test database
+is created and dropped. Run from the backend directory:
+    python -m benchmarks.ingredient_search
+"""
+from functools import partial
+
+from benchmarks.utils import (
+    load_ingredients_catalog,
+    setup_django,
+    temporary_database,
+    timeit,
+)
+
+QUERIES = (
+    "а",
+    "мол",
+    "карто",
+    "сыр",
+    "молко",
+    "картофил",
+    "перец",
+    "черный",
+)
+REPEATS = 50
+LIMIT = 20
+
+
+def main():
+    setup_django()
+    from api.filters import IngredientFilter
+    from api.ingredient_index import get_ingredient_index
+    from api.models import Ingredient
+
+    def search(params: dict):
+        queryset = Ingredient.objects.select_related("measurement_unit")
+        return list(IngredientFilter(params, queryset=queryset).qs)
+
+    with temporary_database() as connection:
+        catalog_size = load_ingredients_catalog()
+        print(f"{connection.vendor}, {catalog_size} ingredients")
+        print(f"{'query':>10} {'mode':>7} {'found':>6} {'mean, ms':>9}"
+              f" {'p95, ms':>8}")
+        index = get_ingredient_index()
+        for query in QUERIES:
+            for mode in ("prefix", "fuzzy", "index"):
+                if mode == "index":
+                    run = partial(index.search, query, LIMIT)
+                else:
+                    params = {"name": query, "search": mode, "limit": LIMIT}
+                    run = partial(search, params)
+                found = len(run())
+                timings = timeit(run, REPEATS)
+                print(
+                    f"{query:>10} {mode:>7} {found:>6}"
+                    f" {timings['mean']:>9.3f} {timings['p95']:>8.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""HTTP load test of user journeys over a seeded dataset.
+
+Seeds a throwaway database through the test factories, starts
+runserver or gunicorn on it and runs virtual users, each in a thread
+with its own account, through the journey of the site: the recipe
+feed filtered by tags and its next page, a recipe, a favorite and a
+shopping cart toggle, the shopping list download and the
+subscriptions feed. Reports per endpoint the throughput, the p50, p95
+and p99 latency and the queries per request, counted by the
+QUERY_INSTRUMENTATION middleware.
+
+The seed fixes the dataset and the choices of the users, results of
+two commits are compared with --output and --baseline:
+    python -m benchmarks.load_test --output before.json
+    python -m benchmarks.load_test --baseline before.json
+
+Needs the same environment as manage.py and gunicorn for the gunicorn
+server. Concurrent writes are serialized by sqlite, capacity is only
+meaningful with DB_ENGINE of PostgreSQL. Run from the backend
+directory:
+    python -m benchmarks.load_test --help
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.utils import (
+    BASE_DIR,
+    name_server_database,
+    setup_django,
+    temporary_database,
+)
+
+PORT = 8766
+TAGS = 12
+TAGS_PER_RECIPE = (1, 3)
+INGREDIENTS = 500
+INGREDIENTS_PER_RECIPE = (3, 10)
+SUBSCRIPTIONS_PER_USER = 5
+CART_SIZE = 5
+PAGE_SIZE = 6
+# the image file is not served by the journeys
+IMAGE = "recipes/benchmark.png"
+PERCENTILES = (50, 95, 99)
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run user journeys against a local server."
+    )
+    parser.add_argument(
+        "--server", choices=("runserver", "gunicorn"), default="gunicorn"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="gunicorn workers"
+    )
+    parser.add_argument(
+        "--users", type=int, default=16, help="concurrent virtual users"
+    )
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--warmup", type=float, default=3, help="seconds not measured"
+    )
+    parser.add_argument("--recipes", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--output", help="write the results to a JSON file")
+    parser.add_argument(
+        "--baseline", help="compare with the results of a JSON file"
+    )
+    return parser.parse_args(args)
+
+
+def seed_database(options) -> dict:
+    """Fill the database, returns what the journeys need to know."""
+    import factory.random
+    from django.db import transaction
+    from rest_framework.authtoken.models import Token
+
+    from api.counters import reconcile_counters
+    from api.models import Recipe, Subscription
+    from api.tests.factories import (
+        AmountIngredientFactory,
+        IngredientFactory,
+        RecipeFactory,
+        TagFactory,
+    )
+    from users.models import CustomUser
+    from users.tests.factories import CustomUserFactory
+
+    factory.random.reseed_random(options.seed)
+    rng = random.Random(options.seed)
+    with transaction.atomic():
+        tags = TagFactory.create_batch(TAGS)
+        ingredients = IngredientFactory.create_batch(INGREDIENTS)
+        authors = CustomUserFactory.create_batch(options.authors)
+        recipes = []
+        for number in range(options.recipes):
+            recipe = RecipeFactory.create(
+                author=authors[number % len(authors)],
+                image=IMAGE,
+                tags=rng.sample(tags, rng.randint(*TAGS_PER_RECIPE)),
+            )
+            for ingredient in rng.sample(
+                ingredients, rng.randint(*INGREDIENTS_PER_RECIPE)
+            ):
+                AmountIngredientFactory.create(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=rng.randint(1, 500),
+                )
+            recipes.append(recipe)
+
+        tokens = []
+        for user in CustomUserFactory.create_batch(options.users):
+            tokens.append(Token.objects.create(user=user).key)
+            Subscription.objects.bulk_create(
+                Subscription(follower=user, leader=leader)
+                for leader in rng.sample(authors, SUBSCRIPTIONS_PER_USER)
+            )
+            user.shopping_cart_recipes.add(*rng.sample(recipes, CART_SIZE))
+        reconcile_counters(Recipe, CustomUser, Subscription)
+    return {"tokens": tokens, "tags": [tag.slug for tag in tags]}
+
+
+class Results:
+    """Latencies, query counts and errors of the requests by endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.recording = False
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, endpoint, latency, queries: Optional[int], error: bool):
+        with self.lock:
+            if not self.recording:
+                return
+            self.latencies[endpoint].append(latency)
+            if queries is not None:
+                self.queries[endpoint].append(queries)
+            if error:
+                self.errors[endpoint] += 1
+
+    def summary(self, duration: float) -> Dict[str, dict]:
+        summary = {}
+        for endpoint in sorted(self.latencies):
+            latencies = sorted(self.latencies[endpoint])
+            queries = self.queries[endpoint]
+            summary[endpoint] = {
+                "requests": len(latencies),
+                "errors": self.errors[endpoint],
+                "throughput": len(latencies) / duration,
+                **{
+                    f"p{share}": percentile(latencies, share) * 1000
+                    for share in PERCENTILES
+                },
+                "queries_mean": (
+                    sum(queries) / len(queries) if queries else None
+                ),
+                "queries_max": max(queries) if queries else None,
+            }
+        return summary
+
+
+def percentile(latencies: List[float], share: int) -> float:
+    """Nearest-rank percentile of sorted latencies."""
+    rank = math.ceil(len(latencies) * share / 100)
+    return latencies[max(rank, 1) - 1]
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, options, token, tags, results, deadline, number):
+        super().__init__(daemon=True)
+        self.connection = http.client.HTTPConnection(
+            "127.0.0.1", options.port, timeout=60
+        )
+        self.headers = {"Authorization": f"Token {token}"}
+        self.tags = tags
+        self.results = results
+        self.deadline = deadline
+        self.rng = random.Random(options.seed * 1000 + number)
+
+    def request(self, endpoint, method, path, expected=(200,)):
+        """Status and body of the response, None for a failed request."""
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, headers=self.headers)
+            response = self.connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.results.add(
+                endpoint, time.perf_counter() - started, None, True
+            )
+            return None, None
+        latency = time.perf_counter() - started
+        queries = response.getheader("X-Query-Count")
+        self.results.add(
+            endpoint,
+            latency,
+            int(queries) if queries is not None else None,
+            response.status not in expected,
+        )
+        return response.status, body
+
+    def get_json(self, endpoint, path) -> Optional[dict]:
+        status, body = self.request(endpoint, "GET", path)
+        if status != 200:
+            return None
+        return json.loads(body)
+
+    def toggle(self, name: str, recipe_id: int):
+        """Add the recipe and take it back, unless it was there."""
+        path = f"/api/recipes/{recipe_id}/{name}/"
+        # 400 is a recipe already there, kept as it was
+        status, _ = self.request(f"{name}-add", "GET", path, (201, 400))
+        if status == 201:
+            self.request(f"{name}-remove", "DELETE", path, (204,))
+        return status
+
+    def journey(self):
+        tags = self.rng.sample(self.tags, 2)
+        query = urlencode(
+            [("limit", PAGE_SIZE)] + [("tags", tag) for tag in tags]
+        )
+        page = self.get_json("recipes-list", f"/api/recipes/?{query}")
+        if not page or not page["results"]:
+            return
+        if page.get("next"):
+            next_url = urlsplit(page["next"])
+            self.get_json(
+                "recipes-list-next", f"{next_url.path}?{next_url.query}"
+            )
+        recipe_id = self.rng.choice(page["results"])["id"]
+        self.get_json("recipes-detail", f"/api/recipes/{recipe_id}/")
+        self.toggle("favorite", recipe_id)
+        self.toggle("shopping_cart", recipe_id)
+        self.request(
+            "shopping-cart-download",
+            "GET",
+            "/api/recipes/download_shopping_cart/",
+        )
+        self.get_json(
+            "subscriptions-list",
+            f"/api/users/subscriptions/?limit={PAGE_SIZE}&recipes_limit=3",
+        )
+
+    def run(self):
+        while time.perf_counter() < self.deadline:
+            self.journey()
+        self.connection.close()
+
+
+def run_server(options, database_name: str) -> subprocess.Popen:
+    address = f"127.0.0.1:{options.port}"
+    commands = {
+        "runserver": ["manage.py", "runserver", address, "--noreload"],
+        "gunicorn": [
+            "-m",
+            "gunicorn",
+            "backend.wsgi:application",
+            "--bind",
+            address,
+            "--workers",
+            str(options.workers),
+            "--log-level",
+            "warning",
+        ],
+    }
+    env = {
+        **os.environ,
+        "DB_NAME": database_name,
+        "DEBUG": "false",
+        "QUERY_INSTRUMENTATION": "true",
+    }
+    return subprocess.Popen(
+        [sys.executable, *commands[options.server]],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_until_up(port: int):
+    for _ in range(100):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        try:
+            connection.request("GET", "/api/tags/")
+            if connection.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.1)
+    raise RuntimeError("the server did not start")
+
+
+def run_load(options, dataset: dict) -> Dict[str, dict]:
+    results = Results()
+    started = time.perf_counter()
+    deadline = started + options.warmup + options.duration
+    users = [
+        VirtualUser(options, token, dataset["tags"], results, deadline, number)
+        for number, token in enumerate(dataset["tokens"])
+    ]
+    for user in users:
+        user.start()
+    time.sleep(options.warmup)
+    with results.lock:
+        results.recording = True
+    for user in users:
+        user.join()
+    return results.summary(options.duration)
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(endpoints: Dict[str, dict], baseline: Optional[dict]):
+    print(
+        f"{'endpoint':>24} {'requests':>8} {'errors':>6} {'req/s':>7}"
+        f" {'p50, ms':>8} {'p95, ms':>8} {'p99, ms':>8} {'queries':>7}"
+    )
+    for endpoint, stats in endpoints.items():
+        queries = stats["queries_mean"]
+        print(
+            f"{endpoint:>24} {stats['requests']:>8} {stats['errors']:>6}"
+            f" {stats['throughput']:>7.1f} {stats['p50']:>8.1f}"
+            f" {stats['p95']:>8.1f} {stats['p99']:>8.1f}"
+            f" {'-' if queries is None else f'{queries:.1f}':>7}"
+        )
+    if baseline is None:
+        return
+    print(
+        f"\ncompared with {baseline['meta']['commit']}:\n"
+        f"{'endpoint':>24} {'req/s':>8} {'p95':>8} {'queries':>8}"
+    )
+    for endpoint, stats in endpoints.items():
+        before = baseline["endpoints"].get(endpoint)
+        if before is None:
+            continue
+        queries = "-"
+        if None not in (stats["queries_mean"], before["queries_mean"]):
+            queries = f"{stats['queries_mean'] - before['queries_mean']:+.1f}"
+        print(
+            f"{endpoint:>24}"
+            f" {change(stats['throughput'], before['throughput']):>8}"
+            f" {change(stats['p95'], before['p95']):>8} {queries:>8}"
+        )
+
+
+def change(value: float, before: float) -> str:
+    if not before:
+        return "-"
+    return f"{(value / before - 1) * 100:+.0f}%"
+
+
+def main(args=None):
+    options = parse_args(args)
+    baseline = None
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    setup_django()
+    database_name = name_server_database("load_test")
+
+    with temporary_database() as connection:
+        started = time.perf_counter()
+        dataset = seed_database(options)
+        print(
+            f"{connection.vendor}, seeded {options.recipes} recipes in"
+            f" {time.perf_counter() - started:.0f} s, {options.server},"
+            f" {options.users} users for {options.duration:.0f} s"
+        )
+        server = run_server(options, database_name)
+        try:
+            wait_until_up(options.port)
+            endpoints = run_load(options, dataset)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print_summary(endpoints, baseline)
+    if options.output:
+        meta = {
+            "commit": get_commit(),
+            "vendor": connection.vendor,
+            **{
+                name: getattr(options, name)
+                for name in (
+                    "server",
+                    "workers",
+                    "users",
+                    "duration",
+                    "recipes",
+                    "authors",
+                    "seed",
+                )
+            },
+        }
+        with open(options.output, "w") as output:
+            json.dump({"meta": meta, "endpoints": endpoints}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Serialization throughput of the read endpoints in rows per second.
+
+Renders recipes, the ingredient catalog and tags, fetched once as the
+views fetch them, with DRF serializers and the compiled ones, each
+through JSONRenderer and FastJSONRenderer. Queries are not timed.
+
+Needs the same environment as manage.py, a temporary test database
+is created and dropped. Run from the backend directory:
+    python -m benchmarks.serialization
+"""
+import time
+
+from benchmarks.utils import (
+    load_ingredients_catalog,
+    setup_django,
+    temporary_database,
+)
+
+RECIPES = 300
+INGREDIENTS_PER_RECIPE = 8
+TAGS = 30
+DURATION = 1.0
+
+
+def fill_database():
+    from api.models import Ingredient
+    from api.tests.factories import (
+        AmountIngredientFactory,
+        RecipeFactory,
+        TagFactory,
+    )
+
+    load_ingredients_catalog()
+    tags = TagFactory.create_batch(TAGS)
+    ingredients = list(Ingredient.objects.all()[:200])
+    for number in range(RECIPES):
+        # the image file is not read by the serializers
+        recipe = RecipeFactory.create(
+            image="recipes/benchmark.png", tags=tags[number % 10::10]
+        )
+        for position in range(INGREDIENTS_PER_RECIPE):
+            AmountIngredientFactory.create(
+                recipe=recipe,
+                ingredient=ingredients[(number + position * 7) % 200],
+                amount=number + position / 4,
+            )
+
+
+def rows_per_second(serializer_class, renderer, rows, context) -> float:
+    rendered = 0
+    started = time.perf_counter()
+    while True:
+        data = serializer_class(rows, many=True, context=context).data
+        renderer.render(data)
+        rendered += len(rows)
+        elapsed = time.perf_counter() - started
+        if elapsed >= DURATION:
+            return rendered / elapsed
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import AnonymousUser
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from api.constants import IMAGE_CARD
+    from api.models import Ingredient, Recipe, Tag
+    from api.renderers import FastJSONRenderer
+    from api.serializers import (
+        CompiledIngredientSerializer,
+        CompiledRecipeSerializer,
+        CompiledTagSerializer,
+        IngredientSerializer,
+        RecipeSerializer,
+        TagSerializer,
+    )
+
+    with temporary_database():
+        fill_database()
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        request.user = AnonymousUser()
+        endpoints = (
+            (
+                "recipes",
+                list(Recipe.objects.for_read(request.user)),
+                {"request": request, "image_variant": IMAGE_CARD},
+                RecipeSerializer,
+                CompiledRecipeSerializer,
+            ),
+            (
+                "ingredients",
+                list(Ingredient.objects.select_related("measurement_unit")),
+                {"request": request},
+                IngredientSerializer,
+                CompiledIngredientSerializer,
+            ),
+            (
+                "tags",
+                list(Tag.objects.all()),
+                {"request": request},
+                TagSerializer,
+                CompiledTagSerializer,
+            ),
+        )
+        print(
+            f"{'endpoint':>11} {'rows':>5} {'serializer':>10}"
+            f" {'renderer':>8} {'rows/s':>9}"
+        )
+        for name, rows, context, serializer, compiled in endpoints:
+            for serializer_name, serializer_class in (
+                ("drf", serializer),
+                ("compiled", compiled),
+            ):
+                for renderer_name, renderer in (
+                    ("stdlib", JSONRenderer()),
+                    ("fast", FastJSONRenderer()),
+                ):
+                    speed = rows_per_second(
+                        serializer_class, renderer, rows, context
+                    )
+                    print(
+                        f"{name:>11} {len(rows):>5} {serializer_name:>10}"
+                        f" {renderer_name:>8} {speed:>9.0f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
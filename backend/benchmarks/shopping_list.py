@@ -0,0 +1,78 @@
+"""Time and peak memory of the shopping list PDF rendering.
+
+Run from the backend directory:
+    python -m benchmarks.shopping_list
+"""
+import io
+import time
+import tracemalloc
+
+from fpdf import FPDF
+
+from api.shopping_list import (
+    FONT_PATH,
+    format_ingredient,
+    render_shopping_list,
+)
+
+SIZES = (10, 500, 5000)
+REPEATS = 3
+
+
+def get_ingredients(number: int) -> list:
+    return [
+        {
+            "name": f"ингредиент_{i}",
+            "amount": i * 1.5,
+            "measurement_unit": "г",
+        }
+        for i in range(number)
+    ]
+
+
+def render_legacy(ingredients) -> io.BytesIO:
+    """The renderer download_shopping_cart used before api.shopping_list."""
+    pdf = FPDF()
+    pdf.add_font("DejaVu", "", FONT_PATH, uni=True)
+    pdf.set_font("DejaVu", "", 14)
+    pdf.add_page()
+    for ingredient in ingredients:
+        pdf.cell(0, 10, txt=format_ingredient(ingredient), ln=1)
+    string_file = pdf.output(dest="S")
+    return io.BytesIO(string_file.encode("latin1"))
+
+
+def measure(render, ingredients) -> tuple:
+    best_time = float("inf")
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        render(ingredients)
+        best_time = min(best_time, time.perf_counter() - started)
+
+    # tracing slows allocations down, so memory is measured separately
+    tracemalloc.start()
+    render(ingredients)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best_time, peak
+
+
+def main():
+    # warm up the per-process font metrics cache, as a worker would be
+    render_shopping_list([])
+    print(f"{'lines':>6} {'renderer':>8} {'time, ms':>10} {'peak, KiB':>10}")
+    for size in SIZES:
+        ingredients = get_ingredients(size)
+        for name, render in (
+            ("legacy", render_legacy),
+            ("cached", render_shopping_list),
+        ):
+            seconds, peak = measure(render, ingredients)
+            print(
+                f"{size:>6} {name:>8} {seconds * 1000:>10.1f}"
+                f" {peak / 1024:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Latency of the recipe feed filtered by tags over 100k recipes.
+
+Compares the join on tags__slug the filter used before, which needs
+DISTINCT to list a recipe with several matching tags once, with the
+EXISTS subquery of RecipeFilter, with and without the
+(tag_id, recipe_id) index of the through table. Each query is the
+first page of the feed, as KeysetPagination asks for it.
+
+Needs the same environment as manage.py, a temporary test database
+is created and dropped. Run from the backend directory:
+    python -m benchmarks.tag_filter
+"""
+import random
+from functools import partial
+
+from benchmarks.utils import setup_django, temporary_database, timeit
+
+RECIPES = 100_000
+TAGS = 12
+# tags of a recipe, the first tags are the most popular
+TAGS_PER_RECIPE = (1, 4)
+BATCH_SIZE = 5000
+PAGE_SIZE = 6
+REPEATS = 30
+INDEX_NAME = "api_recipe_tags_tag_recipe_idx"
+CASES = (
+    ("popular, any", (0, 1), "any"),
+    ("popular, all", (0, 1), "all"),
+    ("rare, any", (TAGS - 2, TAGS - 1), "any"),
+    ("rare, all", (TAGS - 2, TAGS - 1), "all"),
+)
+
+
+def fill_database(recipes: int) -> list:
+    from api.models import Recipe, Tag
+    from users.models import CustomUser
+
+    Tag.objects.bulk_create(
+        Tag(name=f"тег {number}", slug=f"tag-{number}", color="#000000")
+        for number in range(TAGS)
+    )
+    # sqlite returns no ids from bulk_create
+    tags = list(Tag.objects.order_by("pk"))
+    author = CustomUser.objects.create(username="author", email="a@a.ru")
+    through = Recipe.tags.through
+    weights = [1 / (number + 1) ** 2 for number in range(TAGS)]
+    random.seed(1)
+    for start in range(0, recipes, BATCH_SIZE):
+        batch = Recipe.objects.bulk_create(
+            Recipe(
+                name=f"рецепт {number}",
+                author=author,
+                text="",
+                image="recipes/benchmark.png",
+                cooking_time=1,
+            )
+            for number in range(start, min(start + BATCH_SIZE, recipes))
+        )
+        if batch[0].pk is None:
+            batch = list(Recipe.objects.order_by("-pk")[: len(batch)])
+        rows = []
+        for recipe in batch:
+            chosen = set(
+                random.choices(
+                    tags, weights, k=random.randint(*TAGS_PER_RECIPE)
+                )
+            )
+            rows.extend(
+                through(recipe_id=recipe.pk, tag_id=tag.pk) for tag in chosen
+            )
+        through.objects.bulk_create(rows)
+    return tags
+
+
+def filter_join(slugs, mode):
+    from django.db.models import Count
+
+    from api.models import Recipe
+
+    queryset = Recipe.objects.filter(tags__slug__in=slugs)
+    if mode == "all":
+        queryset = queryset.annotate(matched=Count("tags")).filter(
+            matched=len(slugs)
+        )
+    else:
+        queryset = queryset.distinct()
+    return queryset
+
+
+def filter_exists(slugs, mode):
+    from api.filters import RecipeFilter
+    from api.models import Recipe
+
+    params = {"tags": slugs, "tags_match": mode}
+    return RecipeFilter(params, queryset=Recipe.objects.all()).qs
+
+
+def first_page(build, slugs, mode) -> list:
+    queryset = build(slugs, mode).order_by("-pub_date", "-id")
+    return list(queryset.values_list("pk", flat=True)[:PAGE_SIZE])
+
+
+def main():
+    setup_django()
+
+    with temporary_database() as connection:
+        tags = fill_database(RECIPES)
+        with connection.cursor() as cursor:
+            # in case the database was created without migrations
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+                "ON api_recipe_tags (tag_id, recipe_id)"
+            )
+            cursor.execute("ANALYZE")
+        print(f"{connection.vendor}, {RECIPES} recipes, {len(tags)} tags")
+        print(
+            f"{'tags':>13} {'filter':>13} {'mean, ms':>9} {'p95, ms':>8}"
+        )
+        for index in (True, False):
+            if not index:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP INDEX {INDEX_NAME}")
+                    cursor.execute("ANALYZE")
+            for name, numbers, mode in CASES:
+                slugs = [tags[number].slug for number in numbers]
+                expected = first_page(filter_join, slugs, mode)
+                for label, build in (
+                    ("join", filter_join),
+                    ("exists", filter_exists),
+                ):
+                    run = partial(first_page, build, slugs, mode)
+                    if run() != expected:
+                        raise RuntimeError(f"{name}: {label} differs")
+                    if label == "join" and not index:
+                        # the index is not used by the join
+                        continue
+                    timings = timeit(run, REPEATS)
+                    label += "" if index else ", no idx"
+                    print(
+                        f"{name:>13} {label:>13}"
+                        f" {timings['mean']:>9.3f} {timings['p95']:>8.3f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
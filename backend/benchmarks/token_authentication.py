@@ -0,0 +1,61 @@
+"""Time and queries of the token authentication of one request.
+
+Compares TokenAuthentication of DRF, which joins the token with its
+user on every request, with CachedTokenAuthentication answering from
+the "tokens" cache after the first request. The database is a
+throwaway test database, its latency is that of the configured one.
+
+Run from the backend directory:
+    python -m benchmarks.token_authentication
+"""
+from benchmarks.utils import setup_django, temporary_database, timeit
+
+REPEATS = 2000
+
+
+def main():
+    setup_django()
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from users.authentication import CACHE_ALIAS, CachedTokenAuthentication
+    from users.models import CustomUser
+
+    with temporary_database():
+        user = CustomUser.objects.create_user(
+            username="benchmark", email="benchmark@example.com"
+        )
+        token = Token.objects.create(user=user)
+        request = Request(
+            APIRequestFactory().get(
+                "/api/recipes/", HTTP_AUTHORIZATION=f"Token {token.key}"
+            )
+        )
+        caches[CACHE_ALIAS].clear()
+
+        print(f"{'authentication':>26} {'queries':>8} {'mean, us':>9}")
+        for authentication in (
+            TokenAuthentication(),
+            CachedTokenAuthentication(),
+        ):
+            # the first request fills the cache, as any later one would
+            authentication.authenticate(request)
+            with CaptureQueriesContext(connection) as queries:
+                authentication.authenticate(request)
+            timings = timeit(
+                lambda: authentication.authenticate(request), REPEATS
+            )
+            print(
+                f"{type(authentication).__name__:>26}"
+                f" {len(queries.captured_queries):>8}"
+                f" {timings['mean'] * 1000:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+import django
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INGREDIENTS_PATH = os.path.join(BASE_DIR, "utils", "ingredients.json")
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    django.setup()
+
+
+@contextmanager
+def temporary_database():
+    """Run the benchmark against a throwaway copy of the test database."""
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def name_server_database(name: str) -> str:
+    """Name the temporary database, so server processes can open it.
+
+    The in-memory sqlite test database is private to its process, a
+    file is used instead."""
+    from django.conf import settings
+
+    database = settings.DATABASES["default"]
+    if database["ENGINE"].endswith("sqlite3"):
+        database_name = os.path.join(tempfile.mkdtemp(), f"{name}.sqlite3")
+    else:
+        database_name = f"test_{name}"
+    database["TEST"]["NAME"] = database_name
+    return database_name
+
+
+def load_ingredients_catalog(path: str = INGREDIENTS_PATH) -> int:
+    from utils.fill_db import load_ingredients
+
+    inserted, _ = load_ingredients(path)["ingredients"]
+    return inserted
+
+
+def timeit(func: Callable, repeats: int) -> Dict[str, float]:
+    """Mean, p95 and max of the call time in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "mean": statistics.mean(timings),
+        "p95": timings[int(len(timings) * 0.95) - 1],
+        "max": timings[-1],
+    }
@@ -6,3 +6,4 @@ from users.models import CustomUser
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
     search_fields = ["username", "email"]
+    readonly_fields = ("recipes_count", "followers_count")
@@ -0,0 +1,42 @@
+import hashlib
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+CACHE_ALIAS = "tokens"
+
+
+def get_cache_key(key: str) -> str:
+    # the keys are credentials, they are not stored in the cache as is
+    return "token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(*keys: str):
+    """Drop cached lookups of the keys, at once and after the commit.
+
+    The second delete covers a lookup that read the token before the
+    commit and cached it after the first delete."""
+    cache_keys = [get_cache_key(key) for key in keys]
+    caches[CACHE_ALIAS].delete_many(cache_keys)
+    transaction.on_commit(lambda: caches[CACHE_ALIAS].delete_many(cache_keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication with the key to token and user lookup cached.
+
+    A lookup is forgotten when the token is deleted (logout) or its user
+    is saved (password change, deactivation) and expires after the
+    timeout of the cache. Counters of the cached user updated with
+    queryset updates are as old as the lookup, saves of the user leave
+    them out."""
+
+    def authenticate_credentials(self, key):
+        cache = caches[CACHE_ALIAS]
+        cache_key = get_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token)
+            return user, token
+        return token.user, token
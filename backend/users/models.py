@@ -1,6 +1,10 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+# kept up to date with F() updates, a full save of an older copy of the
+# user, like the one of a cached token lookup, must not write them back
+COUNTER_FIELDS = ("recipes_count", "followers_count", "shopping_cart_version")
+
 
 class Role(models.TextChoices):
     USER = "user", "User"
@@ -16,6 +20,21 @@ class CustomUser(AbstractUser):
         choices=Role.choices,
         default=Role.USER,
     )
+    recipes_count = models.PositiveIntegerField(
+        "количество рецептов",
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        "количество подписчиков",
+        default=0,
+        editable=False,
+    )
+    shopping_cart_version = models.PositiveIntegerField(
+        "версия списка покупок",
+        default=0,
+        editable=False,
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = [
         "username",
@@ -31,6 +50,19 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        if (
+            kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def is_admin(self):
         return self.role == Role.ADMIN or self.is_superuser or self.is_staff
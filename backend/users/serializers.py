@@ -19,6 +19,10 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, current_user):
+        # annotated by Recipe.objects.for_read on the read path
+        is_subscribed = getattr(current_user, "is_subscribed", None)
+        if is_subscribed is not None:
+            return is_subscribed
         user_from_request = self.context["request"].user
         if user_from_request.is_anonymous:
             return False
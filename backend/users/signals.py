@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import forget_tokens
+from users.models import CustomUser
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_tokens(instance.key)
+
+
+@receiver(post_save, sender=CustomUser)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    if created:
+        return
+    keys = Token.objects.filter(user=instance).values_list("key", flat=True)
+    forget_tokens(*keys)
@@ -0,0 +1,122 @@
+import shutil
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import shopping_list
+from api.tests.factories import (
+    AmountIngredientFactory,
+    IngredientFactory,
+    RecipeFactory,
+)
+from users.authentication import CACHE_ALIAS
+from users.tests.factories import CustomUserFactory
+
+PASSWORD = "password_user"
+ME_PATH = "/api/users/me/"
+MEDIA_PATH = "./test_media/"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PATH)
+class CachedTokenAuthenticationTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_PATH, ignore_errors=True)
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        caches[shopping_list.CACHE_ALIAS].clear()
+        self.user = CustomUserFactory.create()
+        self.user.set_password(PASSWORD)
+        self.user.save()
+        self.token = Token.objects.create(user=self.user)
+        self.token_client = APIClient()
+        self.token_client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+
+    def get_me(self, expected_status=status.HTTP_200_OK):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.token_client.get(ME_PATH)
+        self.assertEqual(response.status_code, expected_status)
+        token_lookups = [
+            query
+            for query in queries.captured_queries
+            if "authtoken_token" in query["sql"]
+        ]
+        return response, len(token_lookups)
+
+    def test_lookup_cached(self):
+        _, lookups = self.get_me()
+        self.assertEqual(lookups, 1)
+        response, lookups = self.get_me()
+        self.assertEqual(lookups, 0)
+        self.assertEqual(response.data["id"], self.user.id)
+
+    def test_invalid_token_not_cached(self):
+        self.token_client.credentials(HTTP_AUTHORIZATION="Token wrong")
+        for _ in range(2):
+            _, lookups = self.get_me(status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(lookups, 1)
+
+    def test_logout(self):
+        self.get_me()
+        response = self.token_client.post("/api/auth/token/logout/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.get_me(status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation(self):
+        self.get_me()
+        self.user.is_active = False
+        self.user.save()
+        self.get_me(status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change(self):
+        self.get_me()
+        response = self.token_client.post(
+            "/api/users/set_password/",
+            data={"new_password": "Nj8&dk2Lq", "current_password": PASSWORD},
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        _, lookups = self.get_me()
+        self.assertEqual(lookups, 1)
+
+    def test_profile_change(self):
+        self.get_me()
+        self.user.first_name = "Пётр"
+        self.user.save()
+        response, _ = self.get_me()
+        self.assertEqual(response.data["first_name"], "Пётр")
+
+    def test_save_of_cached_user_keeps_counters(self):
+        recipe = RecipeFactory.create()
+        AmountIngredientFactory.create(
+            recipe=recipe, ingredient=IngredientFactory.create(), amount=3
+        )
+        download_path = "/api/recipes/download_shopping_cart/?file_type=txt"
+        self.get_me()
+        response = self.token_client.get(download_path)
+        self.assertEqual(b"".join(response.streaming_content), b"")
+
+        response = self.token_client.get(
+            f"/api/recipes/{recipe.pk}/shopping_cart/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # saves the user of the cached lookup, older than the cart
+        response = self.token_client.post(
+            "/api/users/set_password/",
+            data={"new_password": "Nj8&dk2Lq", "current_password": PASSWORD},
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shopping_cart_version, 1)
+        self.assertTrue(self.user.check_password("Nj8&dk2Lq"))
+        response = self.token_client.get(download_path)
+        self.assertTrue(b"".join(response.streaming_content))
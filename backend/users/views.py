@@ -1,6 +1,8 @@
 from djoser.views import UserViewSet
 from rest_framework.pagination import LimitOffsetPagination
 
+from api.models import subscribed_by
+
 
 class CustomLimitOffsetPagination(LimitOffsetPagination):
     default_limit = 100
@@ -8,3 +10,10 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
 
 class CustomUserViewSet(UserViewSet):
     pagination_class = CustomLimitOffsetPagination
+
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .annotate(is_subscribed=subscribed_by(self.request.user))
+        )
@@ -1,18 +1,105 @@
 import json
+from itertools import islice
+from typing import IO, Iterator, Tuple
+
+from django.db import transaction
 
 from api.models import Ingredient, MeasurementUnit
+from api.versions import INGREDIENTS_CATALOG, bump_version
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 500
+
+
+def iter_json_array(json_file: IO[str], chunk_size: int = CHUNK_SIZE):
+    """Yield items of a top level JSON array without loading the whole file.
+
+    Only the current chunk and the item being decoded are kept in memory."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        chunk = json_file.read(chunk_size)
+        if not chunk:
+            break
+        buffer = chunk.lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array")
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            item, end = None, None
+        # an item at the very end of the buffer (a number, for example)
+        # may continue in the next chunk
+        if end is None or (not eof and not buffer[end:].strip()):
+            if eof:
+                raise ValueError("Unterminated JSON array")
+            chunk = json_file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:].lstrip()
+        if buffer.startswith(","):
+            buffer = buffer[1:]
+
+
+def batched(iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
 
+def load_measurement_units(path_file: str) -> Tuple[int, int]:
+    with open(path_file, encoding="utf-8") as json_file:
+        items = iter_json_array(json_file)
+        names = {item["measurement_unit"] for item in items}
+    before = MeasurementUnit.objects.count()
+    MeasurementUnit.objects.bulk_create(
+        (MeasurementUnit(name=name) for name in names), ignore_conflicts=True
+    )
+    inserted = MeasurementUnit.objects.count() - before
+    return inserted, len(names) - inserted
 
-def fill_db_ingredient_measurement_unit(path_file: str):
-    with open(path_file) as json_file:
-        data = json.load(json_file)
-        for ingredient in data:
-            measurement_unit, _ = MeasurementUnit.objects.get_or_create(
-                name=ingredient["measurement_unit"]
-            )
-            Ingredient.objects.get_or_create(
-                name=ingredient["name"], measurement_unit=measurement_unit
-            )
 
+def load_ingredients(path_file: str, batch_size: int = BATCH_SIZE) -> dict:
+    """Insert the catalog missing from the database.
 
-fill_db_ingredient_measurement_unit("/code/utils/ingredients.json")
+    Returns inserted and skipped numbers of measurement units
+    and ingredients. Rows already present are skipped by the unique
+    constraints, so the load can be repeated safely."""
+    with transaction.atomic():
+        units_inserted, units_skipped = load_measurement_units(path_file)
+        units = dict(MeasurementUnit.objects.values_list("name", "pk"))
+        before = Ingredient.objects.count()
+        total = 0
+        with open(path_file, encoding="utf-8") as json_file:
+            items = iter_json_array(json_file)
+            for batch in batched(items, batch_size):
+                total += len(batch)
+                Ingredient.objects.bulk_create(
+                    (
+                        Ingredient(
+                            name=item["name"],
+                            measurement_unit_id=units[
+                                item["measurement_unit"]
+                            ],
+                        )
+                        for item in batch
+                    ),
+                    ignore_conflicts=True,
+                )
+        inserted = Ingredient.objects.count() - before
+        if units_inserted or inserted:
+            # bulk_create sends no signals, the ingredient index
+            # has to be told about the new rows explicitly
+            bump_version(INGREDIENTS_CATALOG)
+    return {
+        "measurement units": (units_inserted, units_skipped),
+        "ingredients": (inserted, total - inserted),
+    }
@@ -0,0 +1,393 @@
+import csv
+import datetime
+import io
+import json
+import random
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Sequence
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import connection, transaction
+
+from api.counters import reconcile_counters
+from api.models import (
+    AmountIngredient,
+    ImageStatus,
+    Ingredient,
+    Recipe,
+    Subscription,
+    Tag,
+)
+from api.response_cache import SHARED, bump_generations, bump_recipes
+from api.tag_map import forget_tag_map
+from api.versions import RECIPES_DELETED, TAGS, USERS, bump_version
+from users.models import CustomUser
+from utils.fill_db import batched
+
+BATCH_SIZE = 10000
+# publication dates end here, so a seed gives the same rows on any day
+PUBLISHED_UNTIL = datetime.datetime(2021, 10, 1, tzinfo=datetime.timezone.utc)
+# the image file is not needed to read recipes
+IMAGE = "recipes/generated.png"
+MAX_DRAW_ROUNDS = 8
+
+
+class PowerLaw:
+    """Items drawn with weights 1 / rank ** skew, 0 is a uniform draw.
+
+    Ranks are shuffled, so popularity doesn't follow the order of ids."""
+
+    def __init__(self, items: Sequence, skew: float, rng: random.Random):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(
+            accumulate(
+                1 / rank ** skew for rank in range(1, len(self.items) + 1)
+            )
+        )
+        self.rng = rng
+
+    def draw(self, number: int) -> list:
+        return self.rng.choices(
+            self.items, cum_weights=self.cum_weights, k=number
+        )
+
+    def draw_distinct(self, number: int, exclude=None) -> set:
+        """Distinct items, the tail is drawn uniformly when the head
+        keeps repeating."""
+        limit = len(self.items) - (exclude is not None)
+        number = min(number, limit)
+        drawn = set()
+        for _ in range(MAX_DRAW_ROUNDS):
+            drawn.update(self.draw(number - len(drawn)))
+            drawn.discard(exclude)
+            if len(drawn) >= number:
+                return drawn
+        while len(drawn) < number:
+            item = self.items[self.rng.randrange(len(self.items))]
+            if item != exclude:
+                drawn.add(item)
+        return drawn
+
+
+def activity(rng: random.Random, mean: float, limit: int) -> int:
+    """Number of rows of a user, exponential around the mean."""
+    if mean <= 0:
+        return 0
+    return min(round(rng.expovariate(1 / mean)), limit)
+
+
+def copy_value(value) -> str:
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def insert_rows(model, field_names: Sequence[str], rows: Iterable[tuple]):
+    """Insert the rows bypassing the models, so no signals are sent.
+
+    COPY on PostgreSQL, a multi-row INSERT elsewhere."""
+    fields = [model._meta.get_field(name) for name in field_names]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([copy_value(value) for value in row])
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            return
+        placeholders = ", ".join(["%s"] * len(fields))
+        cursor.executemany(
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+            [
+                [
+                    field.get_db_prep_save(value, connection)
+                    for field, value in zip(fields, row)
+                ]
+                for row in rows
+            ],
+        )
+
+
+def insert_batches(model, field_names, rows: Iterator[tuple], size) -> int:
+    inserted = 0
+    for batch in batched(rows, size):
+        insert_rows(model, field_names, batch)
+        inserted += len(batch)
+    return inserted
+
+
+def new_ids(model, after: int) -> List[int]:
+    return list(
+        model.objects.filter(pk__gt=after)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def last_id(model) -> int:
+    last = model.objects.order_by("-pk").values_list("pk", flat=True)
+    return last.first() or 0
+
+
+def create_tags(number: int) -> List[int]:
+    """Ids of the tags, the missing ones are created."""
+    existing = Tag.objects.count()
+    if existing < number:
+        # saved one by one, the slug is made unique by AutoSlugField
+        for position in range(existing, number):
+            Tag.objects.get_or_create(name=f"Тег {position + 1}")
+        bump_version(TAGS)
+        bump_generations(SHARED)
+        forget_tag_map()
+    return list(Tag.objects.order_by("pk").values_list("pk", flat=True))
+
+
+def generate_users(
+    number: int, first: int, days: int, seed: int, batch_size: int
+) -> int:
+    """Users without a usable password, joined before the recipes."""
+    password = f"{UNUSABLE_PASSWORD_PREFIX}generated-{seed}"
+    joined = PUBLISHED_UNTIL - datetime.timedelta(days=days)
+    rows = (
+        (
+            f"generated_{position}",
+            f"generated_{position}@example.com",
+            f"Имя_{position}",
+            f"Фамилия_{position}",
+            password,
+            joined,
+            True,
+            False,
+            False,
+            "user",
+            0,
+            0,
+            0,
+        )
+        for position in range(first, first + number)
+    )
+    return insert_batches(
+        CustomUser,
+        (
+            "username",
+            "email",
+            "first_name",
+            "last_name",
+            "password",
+            "date_joined",
+            "is_active",
+            "is_staff",
+            "is_superuser",
+            "role",
+            "recipes_count",
+            "followers_count",
+            "shopping_cart_version",
+        ),
+        rows,
+        batch_size,
+    )
+
+
+def generate_recipes(
+    number: int,
+    first: int,
+    authors: PowerLaw,
+    days: int,
+    rng: random.Random,
+    batch_size: int,
+) -> int:
+    """Recipes published over the days, in the order of their ids."""
+    start = PUBLISHED_UNTIL - datetime.timedelta(days=days)
+    offsets = sorted(rng.uniform(0, days * 86400) for _ in range(number))
+    author_ids = authors.draw(number)
+    rows = (
+        (
+            f"Рецепт {first + position}",
+            author_ids[position],
+            IMAGE,
+            ImageStatus.READY.value,
+            {},
+            f"Описание рецепта {first + position}.",
+            rng.randint(1, 180),
+            published,
+            published,
+            0,
+            0,
+        )
+        for position, published in enumerate(
+            start + datetime.timedelta(seconds=offset) for offset in offsets
+        )
+    )
+    return insert_batches(
+        Recipe,
+        (
+            "name",
+            "author",
+            "image",
+            "image_status",
+            "image_variants",
+            "text",
+            "cooking_time",
+            "pub_date",
+            "updated_at",
+            "favorites_count",
+            "shopping_cart_count",
+        ),
+        rows,
+        batch_size,
+    )
+
+
+def generate_dataset(
+    *,
+    recipes: int,
+    users: int,
+    ingredients_per_recipe: float,
+    tags_per_recipe: float,
+    favorites_per_user: float,
+    cart_per_user: float,
+    subscriptions_per_user: float,
+    popularity_skew: float,
+    author_skew: float,
+    tags: int,
+    days: int,
+    seed: int,
+    batch_size: int = BATCH_SIZE,
+    log=None,
+) -> dict:
+    """Bulk insert synthetic users, recipes and what users do with them.
+
+    Recipes are written by the users with the productivity following a
+    power law of author_skew, recipes, ingredients and tags are chosen
+    with popularity following a power law of popularity_skew. Users
+    follow the productive authors. The numbers of rows of a recipe or
+    a user are exponential around the means. The same seed over the
+    same database gives the same rows.
+
+    Rows are inserted bypassing the models: the counters are
+    reconciled and the caches invalidated at the end. Returns the
+    number of inserted rows of each table."""
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    ingredient_ids = list(
+        Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+    )
+    if not ingredient_ids:
+        raise ValueError("Load the ingredients catalog first")
+    inserted = {}
+
+    with transaction.atomic():
+        tag_ids = create_tags(tags)
+        after = last_id(CustomUser)
+        inserted["users"] = generate_users(
+            users, after + 1, days, seed, batch_size
+        )
+        user_ids = new_ids(CustomUser, after)
+        log(f"users: {inserted['users']}")
+        authors = PowerLaw(user_ids, author_skew, rng)
+
+        after = last_id(Recipe)
+        inserted["recipes"] = generate_recipes(
+            recipes, after + 1, authors, days, rng, batch_size
+        )
+        recipe_ids = new_ids(Recipe, after)
+        log(f"recipes: {inserted['recipes']}")
+
+    popular_ingredients = PowerLaw(ingredient_ids, popularity_skew, rng)
+    popular_tags = PowerLaw(tag_ids, popularity_skew, rng)
+    popular_recipes = PowerLaw(recipe_ids, popularity_skew, rng)
+
+    def amounts():
+        for recipe_id in recipe_ids:
+            chosen = popular_ingredients.draw_distinct(
+                max(activity(rng, ingredients_per_recipe, 100), 1)
+            )
+            for ingredient_id in sorted(chosen):
+                yield recipe_id, ingredient_id, rng.randint(1, 1000)
+
+    def recipe_tags():
+        for recipe_id in recipe_ids:
+            chosen = popular_tags.draw_distinct(
+                max(activity(rng, tags_per_recipe, len(tag_ids)), 1)
+            )
+            for tag_id in sorted(chosen):
+                yield recipe_id, tag_id
+
+    def chosen_recipes(mean: float):
+        limit = len(recipe_ids) // 2
+        for user_id in user_ids:
+            chosen = popular_recipes.draw_distinct(
+                activity(rng, mean, limit)
+            )
+            for recipe_id in sorted(chosen):
+                yield recipe_id, user_id
+
+    def subscriptions():
+        limit = len(user_ids) // 2
+        for user_id in user_ids:
+            leaders = authors.draw_distinct(
+                activity(rng, subscriptions_per_user, limit), exclude=user_id
+            )
+            for leader_id in sorted(leaders):
+                yield user_id, leader_id
+
+    tables = (
+        (
+            "ingredient amounts",
+            AmountIngredient,
+            ("recipe", "ingredient", "amount"),
+            amounts(),
+        ),
+        (
+            "recipe tags",
+            Recipe.tags.through,
+            ("recipe", "tag"),
+            recipe_tags() if tag_ids else (),
+        ),
+        (
+            "favorites",
+            Recipe.users_chose_as_favorite.through,
+            ("recipe", "customuser"),
+            chosen_recipes(favorites_per_user),
+        ),
+        (
+            "shopping carts",
+            Recipe.users_put_in_cart.through,
+            ("recipe", "customuser"),
+            chosen_recipes(cart_per_user),
+        ),
+        (
+            "subscriptions",
+            Subscription,
+            ("follower", "leader"),
+            subscriptions(),
+        ),
+    )
+    for name, model, field_names, rows in tables:
+        with transaction.atomic():
+            inserted[name] = insert_batches(
+                model, field_names, rows, batch_size
+            )
+        log(f"{name}: {inserted[name]}")
+
+    with transaction.atomic():
+        reconcile_counters(Recipe, CustomUser, Subscription)
+        # new rows of new users and recipes only, no cart or version
+        # of an existing user changes
+        bump_recipes()
+        # the recipes are back-dated and the authors new, the latest
+        # updated_at of the feed validators doesn't move
+        bump_version(RECIPES_DELETED)
+        bump_version(USERS)
+    return inserted